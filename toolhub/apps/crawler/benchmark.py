@@ -0,0 +1,176 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import gzip
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+
+
+class Document:
+    """A generated toolinfo document and how to serve it."""
+
+    def __init__(self, path, status=200, records=(), latency=0, redirect=None):
+        """Initialize a new instance."""
+        self.path = path
+        self.status = status
+        self.records = list(records)
+        self.latency = latency
+        self.redirect = redirect
+        self.body = json.dumps(self.records, indent=2).encode("utf-8")
+        self.gzipped = gzip.compress(self.body)
+        self.etag = '"{}"'.format(hashlib.sha1(self.body).hexdigest())
+
+
+def generate_documents(
+    count,
+    max_records=50,
+    max_latency=0.05,
+    error_rate=0.05,
+    redirect_rate=0.05,
+    seed=0,
+):
+    """Generate toolinfo documents of varying size and behavior.
+
+    :param count: Number of documents to generate
+    :param max_records: Largest number of records in a single document
+    :param max_latency: Longest delay (in seconds) before responding
+    :param error_rate: Fraction of documents that respond with an error
+    :param redirect_rate: Fraction of documents that are behind a redirect
+    :param seed: Random seed, so that runs can be compared
+    :return: dict of path to Document
+    """
+    rand = random.Random(seed)
+    docs = {}
+    for i in range(count):
+        path = "/toolinfo/{}.json".format(i)
+        latency = rand.uniform(0, max_latency)
+        if rand.random() < error_rate:
+            status = rand.choice((404, 500, 503))
+            docs[path] = Document(path, status=status, latency=latency)
+            continue
+        records = [
+            {
+                "name": "bench-{}-{}".format(i, n),
+                "title": "Benchmark tool {} {}".format(i, n),
+                "description": "Lorem ipsum dolor sit amet. "
+                * rand.randint(1, 40),
+                "url": "https://bench.example/{}/{}".format(i, n),
+                "keywords": "benchmark, synthetic, tool{}".format(n),
+                "author": "Benchmark author {}".format(n % 7),
+                "repository": "https://git.example/{}/{}".format(i, n),
+            }
+            for n in range(rand.randint(1, max_records))
+        ]
+        docs[path] = Document(path, records=records, latency=latency)
+        if rand.random() < redirect_rate:
+            from_path = "/redirect/{}".format(i)
+            docs[from_path] = Document(
+                from_path, status=302, latency=latency, redirect=path
+            )
+            docs[path].latency = 0
+    return docs
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serve generated documents."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa: N802
+        """Handle a GET request."""
+        doc = self.server.documents.get(self.path)
+        if doc is None:
+            self.send_empty(404)
+            return
+        time.sleep(doc.latency)
+        if doc.redirect:
+            self.send_empty(doc.status, location=doc.redirect)
+        elif doc.status != 200:
+            self.send_empty(doc.status)
+        elif self.headers.get("if-none-match") == doc.etag:
+            self.send_empty(304, etag=doc.etag)
+        else:
+            body = doc.body
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("etag", doc.etag)
+            if "gzip" in self.headers.get("accept-encoding", ""):
+                body = doc.gzipped
+                self.send_header("content-encoding", "gzip")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def send_empty(self, status, **headers):
+        """Send a response without a body."""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("content-length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):  # noqa: A002
+        """Do not log requests."""
+
+
+class ToolinfoServer(http.server.ThreadingHTTPServer):
+    """Local HTTP server for generated toolinfo documents.
+
+    Use as a context manager to serve requests from a background thread::
+
+        with ToolinfoServer(generate_documents(100)) as server:
+            urls = server.urls()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, documents, host="127.0.0.1", port=0):
+        """Initialize a new instance.
+
+        :param documents: dict of path to Document to serve
+        :param host: Address to listen on
+        :param port: Port to listen on. Defaults to an unused port.
+        """
+        super().__init__((host, port), RequestHandler)
+        self.documents = documents
+        self.thread = None
+
+    def urls(self):
+        """Get the URLs to crawl, excluding redirect targets."""
+        targets = {doc.redirect for doc in self.documents.values()}
+        host, port = self.server_address[:2]
+        return [
+            "http://{}:{}{}".format(host, port, path)
+            for path in self.documents
+            if path not in targets
+        ]
+
+    def __enter__(self):
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="toolinfo-server", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.thread.join()
+        self.server_close()
@@ -15,6 +15,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import contextvars
 import io
 import logging
 import threading
@@ -23,8 +24,49 @@ import threading
 DEFAULT_FORMAT = "%(asctime)s %(name)s %(levelname)s: %(message)s"
 COMPACT_FORMAT = "%(levelname)s: %(message)s"
 
+# Innermost LogCaptureContext for the current thread or task
+_active_capture = contextvars.ContextVar("active_capture", default=None)
+_handlers = {}
+_handlers_lock = threading.Lock()
 
-class LogCaptureContext:
+
+class ContextLogHandler(logging.Handler):
+    """Pass records to the LogCaptureContext active in the current context.
+
+    One instance is attached to each logger that logs are captured from and
+    is left in place. Entering and leaving a capture context only changes
+    context-local state, so concurrent threads and tasks each collect their
+    own records and the logging configuration is never modified while
+    records are being emitted.
+    """
+
+    def handle(self, record):
+        """Conditionally capture the record."""
+        captured = False
+        capture = _active_capture.get()
+        while capture is not None:
+            if capture.handler is self:
+                captured = capture.capture(record) or captured
+            capture = capture.parent
+        return captured
+
+    def emit(self, record):
+        """Unused, records are written by the LogCaptureContext."""
+
+
+def context_handler(logger):
+    """Get the ContextLogHandler attached to a logger."""
+    with _handlers_lock:
+        handler = _handlers.get(logger.name)
+        if handler is None:
+            handler = _handlers[logger.name] = ContextLogHandler()
+        if handler not in logger.handlers:
+            # Attach (again if logging has been reconfigured)
+            logger.addHandler(handler)
+        return handler
+
+
+class LogCaptureContext(logging.Filterer):
     """Collect log events in a buffer."""
 
     def __init__(
@@ -35,30 +77,38 @@ class LogCaptureContext:
         filters=None,
     ):
         """Setup context."""
+        super().__init__()
         self.logger = logger
         if logger is None:
             self.logger = logging.getLogger()
         self.level = level
-        self.format = fmt
+        self.formatter = logging.Formatter(fmt)
         self.stream = io.StringIO()
-        self.filters = filters or []
+        for filter_ in filters or []:
+            self.addFilter(filter_)
         self.handler = None
+        self.parent = None
+        self.token = None
+
+    def capture(self, record):
+        """Write a record to the buffer if it passes our level and filters."""
+        if record.levelno < self.level or not self.filter(record):
+            return False
+        self.stream.write(self.formatter.format(record) + "\n")
+        return True
 
     def __enter__(self):
         """Enter context."""
-        self.handler = logging.StreamHandler(self.stream)
-        self.handler.setLevel(self.level)
-        self.handler.setFormatter(logging.Formatter(self.format))
-        for filter_ in self.filters:
-            self.handler.addFilter(filter_)
-        self.logger.addHandler(self.handler)
+        self.handler = context_handler(self.logger)
+        self.parent = _active_capture.get()
+        self.token = _active_capture.set(self)
         return self.stream
 
     def __exit__(self, exc_type, exc_value, traceback):
         """Exit context."""
-        if self.handler is not None:
-            self.logger.removeHandler(self.handler)
-            self.handler.close()
+        if self.token is not None:
+            _active_capture.reset(self.token)
+            self.token = None
         if not self.stream.closed:
             self.stream.close()
 
@@ -70,17 +120,11 @@ class CaptureCrawlLogs(LogCaptureContext):
         """Setup context."""
         self.model = model
         self.field = field
-        thread_id = threading.get_ident()
-        filters = [
-            # Only collect records for toolhub classes
-            logging.Filter(name="toolhub"),
-            # Only collect records emitted by the same thread that called us
-            lambda r: r.thread == thread_id,
-        ]
         super().__init__(
+            # Only collect records for toolhub classes
+            logger=logging.getLogger("toolhub"),
             level=logging.INFO,
             fmt=COMPACT_FORMAT,
-            filters=filters,
         )
 
     def __exit__(self, exc_type, exc_value, traceback):
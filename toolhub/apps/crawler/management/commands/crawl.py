@@ -15,9 +15,28 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import argparse
+
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
 
 from toolhub.apps.crawler.tasks import Crawler
+from toolhub.apps.crawler.tasks import DryRunCrawler
+
+
+def shard_spec(value):
+    """Parse an I/N shard specification."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "expected I/N, got {!r}".format(value)
+        )
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            "shard index must be between 0 and {}".format(count - 1)
+        )
+    return index, count
 
 
 class Command(BaseCommand):
@@ -25,10 +44,109 @@ class Command(BaseCommand):
 
     help = "Run the crawler"  # noqa: A003
 
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Maximum number of URLs to fetch in parallel "
+            "(default: settings.CRAWLER_MAX_WORKERS)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="crawl_all",
+            help="Crawl all URLs, not only those that are due",
+        )
+        parser.add_argument(
+            "--shard",
+            type=shard_spec,
+            default=None,
+            metavar="I/N",
+            help="Only crawl shard I (counting from 0) of N shards",
+        )
+        parser.add_argument(
+            "--run-key",
+            default=None,
+            help="Key of the run shared by all shards of a sharded crawl "
+            "(required with --shard)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue an unfinished run, skipping completed URLs",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changes a crawl would make without saving them",
+        )
+
     def handle(self, *args, **options):
         """Execute the command."""
-        spider = Crawler()
+        if options["dry_run"]:
+            if options["run_key"] or options["resume"]:
+                raise CommandError(
+                    "--dry-run can not be used with --run-key or --resume"
+                )
+            self.dry_run(options)
+            return
+        if options["shard"] and options["shard"][1] > 1:
+            if not options["run_key"]:
+                raise CommandError("--shard requires --run-key")
+        spider = Crawler(
+            max_workers=options["workers"],
+            crawl_all=options["crawl_all"],
+            shard=options["shard"],
+            run_key=options["run_key"],
+            resume=options["resume"],
+        )
         run = spider.crawl()
         self.stdout.write(repr(run))
         for url in run.urls.all():
             self.stdout.write(repr(url))
+
+    def dry_run(self, options):
+        """Report the changes a crawl would make."""
+        spider = DryRunCrawler(
+            max_workers=options["workers"],
+            crawl_all=options["crawl_all"],
+            shard=options["shard"],
+        )
+        run = spider.crawl()
+        deleted = 0
+        for url in spider.report:
+            self.stdout.write(
+                "{url}: status={status_code} valid={valid}".format(**url)
+            )
+            for name in url["create"]:
+                self.stdout.write("  create {}".format(name))
+            for name, changes in url["update"].items():
+                self.stdout.write("  update {}".format(name))
+                for field, (prior, value) in changes.items():
+                    self.stdout.write(
+                        "    {}: {} -> {}".format(
+                            field,
+                            self.format_value(prior),
+                            self.format_value(value),
+                        )
+                    )
+            for name in url["delete"]:
+                self.stdout.write("  delete {}".format(name))
+            for name in url["reject"]:
+                self.stdout.write("  reject {}".format(name))
+            deleted += len(url["delete"])
+        self.stdout.write(
+            "Would create {}, update {} and delete {} of {} tools".format(
+                run.new_tools, run.updated_tools, deleted, run.total_tools
+            )
+        )
+
+    def format_value(self, value, limit=80):
+        """Format a value for display."""
+        text = repr(value)
+        if len(text) > limit:
+            cut = limit - 3
+            text = text[:cut] + "..."
+        return text
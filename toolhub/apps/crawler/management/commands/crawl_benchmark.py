@@ -0,0 +1,224 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from django_elasticsearch_dsl.registries import registry
+
+from toolhub.apps.crawler.benchmark import ToolinfoServer
+from toolhub.apps.crawler.benchmark import generate_documents
+from toolhub.apps.crawler.models import Url
+from toolhub.apps.crawler.tasks import Crawler
+from toolhub.apps.search import indexing
+from toolhub.apps.user.models import ToolhubUser
+
+
+class QueryCounter:
+    """Count database queries using connection.execute_wrapper."""
+
+    def __init__(self):
+        """Initialize a new instance."""
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count a query and execute it."""
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchmarkCrawler(Crawler):
+    """Crawler that only crawls the benchmark's URLs."""
+
+    def __init__(self, url_ids, **kwargs):
+        """Initialize a new instance.
+
+        :param url_ids: Ids of the Urls to crawl
+        """
+        super().__init__(crawl_all=True, **kwargs)
+        self.url_ids = url_ids
+
+    def get_active_urls(self):
+        """Get the benchmark URLs."""
+        return super().get_active_urls().filter(pk__in=self.url_ids)
+
+    def crawl(self):
+        """Crawl and send search index updates."""
+        run = super().crawl()
+        # The benchmark's transaction is rolled back, so index updates
+        # waiting for it to commit must be sent now to be measured.
+        indexing.flush()
+        return run
+
+
+@contextlib.contextmanager
+def benchmark_indices():
+    """Send search index updates to throwaway indices.
+
+    Each search document is pointed at a new empty index for the
+    duration of the block, and the index is deleted afterwards. The
+    benchmark's tools only exist in a transaction that is rolled back,
+    so they must never reach the live indices.
+    """
+    suffix = timezone.now().strftime("%Y%m%d%H%M%S")
+    swapped = []
+    try:
+        for doc in registry.get_documents():
+            client = doc._get_connection()
+            alias = doc._index._name
+            name = "{}-benchmark-{}".format(alias, suffix)
+            doc._index.clone(name=name).create(using=client)
+            doc._index._name = name
+            swapped.append((doc, client, alias))
+        yield
+    finally:
+        for doc, client, alias in swapped:
+            name, doc._index._name = doc._index._name, alias
+            client.indices.delete(index=name, ignore=404)
+
+
+class Command(BaseCommand):
+    """Benchmark the crawler against a local synthetic toolinfo server."""
+
+    help = "Benchmark the crawler"  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--urls", type=int, default=100, help="Number of URLs to crawl"
+        )
+        parser.add_argument(
+            "--records",
+            type=int,
+            default=50,
+            help="Largest number of toolinfo records per URL",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Longest response delay in seconds",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.05,
+            help="Fraction of URLs that respond with an error",
+        )
+        parser.add_argument(
+            "--redirect-rate",
+            type=float,
+            default=0.05,
+            help="Fraction of URLs that redirect",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=2,
+            help="Number of crawls. Later crawls find unchanged content.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Maximum number of URLs to fetch in parallel "
+            "(default: settings.CRAWLER_MAX_WORKERS)",
+        )
+        parser.add_argument(
+            "--host-delay",
+            type=float,
+            default=0,
+            help="Seconds between requests to the server (default: 0)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--with-search",
+            action="store_true",
+            help="Update a throwaway search index while crawling",
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        documents = generate_documents(
+            options["urls"],
+            max_records=options["records"],
+            max_latency=options["latency"],
+            error_rate=options["error_rate"],
+            redirect_rate=options["redirect_rate"],
+            seed=options["seed"],
+        )
+        records = sum(len(doc.records) for doc in documents.values())
+        crawler_settings = {
+            # All URLs share one host
+            "CRAWLER_PER_HOST_MAX_WORKERS": 1024,
+            "CRAWLER_PER_HOST_DELAY": options["host_delay"],
+        }
+        indices = contextlib.nullcontext()
+        if options["with_search"]:
+            indices = benchmark_indices()
+        else:
+            crawler_settings["ELASTICSEARCH_DSL_AUTOSYNC"] = False
+
+        with ToolinfoServer(documents) as server, override_settings(
+            **crawler_settings
+        ), indices, transaction.atomic():
+            user = ToolhubUser.objects.create(username="crawl-benchmark")
+            url_ids = [
+                Url.objects.create(url=url, created_by=user).pk
+                for url in server.urls()
+            ]
+            for i in range(options["runs"]):
+                crawler = BenchmarkCrawler(
+                    url_ids, max_workers=options["workers"]
+                )
+                self.crawl(i + 1, crawler, len(url_ids), records)
+            # Leave the database as we found it
+            transaction.set_rollback(True)
+
+    def crawl(self, number, crawler, urls, records):
+        """Run a crawl and report on its performance."""
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            run = crawler.crawl()
+        elapsed = time.perf_counter() - start
+        # ru_maxrss is in kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            "run {}: {} urls, {} records in {:.2f}s; "
+            "{:.1f} urls/s; {:.1f} records/s; {:.2f} queries/record; "
+            "new={} updated={} total={}; peak rss {:.1f} MiB".format(
+                number,
+                urls,
+                records,
+                elapsed,
+                urls / elapsed,
+                records / elapsed,
+                queries.count / max(1, records),
+                run.new_tools,
+                run.updated_tools,
+                run.total_tools,
+                peak,
+            )
+        )
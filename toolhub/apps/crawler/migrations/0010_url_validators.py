@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0009_runurl_logs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='url',
+            name='etag',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='last_modified',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:48
+
+from django.db import migrations, models
+import jsonfield.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0010_url_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='url',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='record_hashes',
+            field=jsonfield.fields.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0011_url_content_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='url',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='crawl_interval',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='url',
+            name='next_crawl_date',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
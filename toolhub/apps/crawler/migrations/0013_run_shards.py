@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0012_url_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='shards',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='shards_done',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
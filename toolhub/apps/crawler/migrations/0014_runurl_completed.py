@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0013_run_shards'),
+    ]
+
+    operations = [
+        # Treat rows written before checkpointing existed as complete
+        migrations.AddField(
+            model_name='runurl',
+            name='completed',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='runurl',
+            name='completed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0014_runurl_completed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='run',
+            name='db_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='download_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='elapsed_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='parse_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='validate_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='wait_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='runurl',
+            name='db_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='runurl',
+            name='download_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='runurl',
+            name='parse_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='runurl',
+            name='validate_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='runurl',
+            name='wait_ms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.17 on 2026-10-18 17:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0015_phase_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('end_date', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='finished_shards', to='crawler.Run')),
+            ],
+            options={
+                'unique_together': {('run', 'shard')},
+            },
+        ),
+    ]
@@ -18,6 +18,8 @@
 from django.conf import settings
 from django.db import models
 
+from jsonfield import JSONField
+
 from toolhub.apps.auditlog.signals import registry
 from toolhub.apps.toolinfo.models import Tool
 
@@ -37,10 +39,79 @@ class Url(models.Model):
     created_date = models.DateTimeField(
         auto_now_add=True, blank=True, editable=False, db_index=True
     )
+    # Cache validators from the last successful crawl of this URL. Used to
+    # make conditional requests in later runs.
+    etag = models.CharField(
+        blank=True, max_length=255, null=True, editable=False
+    )
+    last_modified = models.CharField(
+        blank=True, max_length=64, null=True, editable=False
+    )
+    # Digests of the last valid response body and of each normalized
+    # toolinfo record found in it. Used to skip unchanged content.
+    content_hash = models.CharField(
+        blank=True, max_length=64, null=True, editable=False
+    )
+    record_hashes = JSONField(blank=True, default=dict, editable=False)
+    # Crawl scheduling state
+    next_crawl_date = models.DateTimeField(
+        blank=True, null=True, editable=False, db_index=True
+    )
+    crawl_interval = models.PositiveIntegerField(
+        blank=True, null=True, editable=False
+    )
+    consecutive_failures = models.PositiveIntegerField(
+        default=0, editable=False
+    )
+
+    # Fields describing the content and schedule of the current address
+    CRAWL_STATE_FIELDS = (
+        "etag",
+        "last_modified",
+        "content_hash",
+        "record_hashes",
+        "next_crawl_date",
+        "crawl_interval",
+        "consecutive_failures",
+    )
 
     def __str__(self):
         return self.url
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the address a Url was loaded with."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_url = dict(zip(field_names, values)).get("url")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save the Url.
+
+        Validators, content hashes and scheduling state are reset when the
+        address changes, so the new address is crawled as soon as possible
+        and is not sent conditional headers meant for another resource.
+        """
+        loaded = getattr(self, "_loaded_url", None)
+        if loaded is not None and loaded != self.url:
+            self.reset_crawl_state()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | set(
+                    self.CRAWL_STATE_FIELDS
+                )
+        super().save(*args, **kwargs)
+        self._loaded_url = self.url
+
+    def reset_crawl_state(self):
+        """Forget what was learned from crawling the URL."""
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+        self.record_hashes = {}
+        self.next_crawl_date = None
+        self.crawl_interval = None
+        self.consecutive_failures = 0
+
     @property
     def auditlog_label(self):
         """Get label for use in auditlog output."""
@@ -55,6 +126,19 @@ class Run(models.Model):
     new_tools = models.PositiveIntegerField(blank=True, default=0)
     updated_tools = models.PositiveIntegerField(blank=True, default=0)
     total_tools = models.PositiveIntegerField(blank=True, default=0)
+    # Shared by all processes of a sharded crawl
+    key = models.CharField(
+        max_length=64, unique=True, blank=True, null=True, editable=False
+    )
+    shards = models.PositiveSmallIntegerField(default=1, editable=False)
+    shards_done = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Sum of the phase timings of all RunUrls
+    elapsed_ms = models.PositiveIntegerField(default=0, editable=False)
+    wait_ms = models.PositiveIntegerField(default=0, editable=False)
+    download_ms = models.PositiveIntegerField(default=0, editable=False)
+    parse_ms = models.PositiveIntegerField(default=0, editable=False)
+    validate_ms = models.PositiveIntegerField(default=0, editable=False)
+    db_ms = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return "id={}; start={:%Y-%m-%d %H:%M}".format(
@@ -63,6 +147,26 @@ class Run(models.Model):
         )
 
 
+class RunShard(models.Model):
+    """A shard of a Run that has finished crawling."""
+
+    run = models.ForeignKey(
+        Run,
+        related_name="finished_shards",
+        on_delete=models.CASCADE,
+    )
+    shard = models.PositiveSmallIntegerField()
+    end_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Metadata for model."""
+
+        unique_together = [["run", "shard"]]
+
+    def __str__(self):
+        return "run: {}; shard: {}".format(self.run_id, self.shard)
+
+
 class RunUrl(models.Model):
     """Information about a URL crawled during a Run."""
 
@@ -78,7 +182,18 @@ class RunUrl(models.Model):
     )
     status_code = models.PositiveSmallIntegerField()
     redirected = models.BooleanField(default=False)
+    # Time from sending the request until the response headers arrived
     elapsed_ms = models.PositiveIntegerField(default=0)
+    # Time waiting for the per-host rate limiter
+    wait_ms = models.PositiveIntegerField(default=0, editable=False)
+    # Time reading the response body
+    download_ms = models.PositiveIntegerField(default=0, editable=False)
+    # Time decoding JSON
+    parse_ms = models.PositiveIntegerField(default=0, editable=False)
+    # Time validating records
+    validate_ms = models.PositiveIntegerField(default=0, editable=False)
+    # Time writing tools and related rows to the database
+    db_ms = models.PositiveIntegerField(default=0, editable=False)
     schema = models.CharField(blank=True, max_length=32, null=True)
     valid = models.BooleanField(default=False)
     tools = models.ManyToManyField(
@@ -86,6 +201,8 @@ class RunUrl(models.Model):
         related_name="crawer_runs",
     )
     logs = models.TextField(blank=True)
+    # Set once the URL has been fully processed
+    completed = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return "id={}; run: {}; url: {}; status_code: {}; valid: {}".format(
@@ -0,0 +1,119 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import collections
+import contextlib
+import datetime
+import email.utils
+import itertools
+import threading
+import time
+import urllib.parse
+
+
+def url_host(url):
+    """Get the lowercase host name of a URL."""
+    return (urllib.parse.urlsplit(url).hostname or "").lower()
+
+
+def interleave_by_host(urls, key=lambda u: u):
+    """Reorder URLs so that consecutive items target different hosts.
+
+    URLs are grouped by host and then taken round-robin from each group.
+    Relative order within a host is preserved.
+    """
+    groups = collections.OrderedDict()
+    for url in urls:
+        groups.setdefault(url_host(key(url)), []).append(url)
+    for batch in itertools.zip_longest(*groups.values()):
+        for url in batch:
+            if url is not None:
+                yield url
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header value into a number of seconds.
+
+    :returns: Seconds to wait or None if the value is invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0, (when - now).total_seconds())
+
+
+class HostRateLimiter:
+    """Limit concurrency and request rate per remote host.
+
+    Shared by all worker threads of a crawl. Each request must be made
+    while holding a slot for its host.
+    """
+
+    def __init__(self, max_concurrent=1, delay=0):
+        """Initialize a new instance.
+
+        :param max_concurrent: Maximum number of in-flight requests per host
+        :param delay: Minimum number of seconds between starting requests
+            to the same host
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.delay = max(0, delay)
+        self._cond = threading.Condition()
+        self._active = collections.Counter()
+        self._not_before = {}
+
+    @contextlib.contextmanager
+    def slot(self, url):
+        """Wait until a request to the host of the given URL is allowed."""
+        host = url_host(url)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._not_before.get(host, 0) - now
+                if self._active[host] < self.max_concurrent and wait <= 0:
+                    break
+                if self._active[host] >= self.max_concurrent:
+                    # Woken by notify_all when a slot is released
+                    wait = None
+                self._cond.wait(timeout=wait)
+            self._active[host] += 1
+            self._not_before[host] = now + self.delay
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[host] -= 1
+                self._cond.notify_all()
+
+    def defer(self, url, seconds):
+        """Delay all further requests to the host of the given URL."""
+        host = url_host(url)
+        with self._cond:
+            self._not_before[host] = max(
+                self._not_before.get(host, 0),
+                time.monotonic() + seconds,
+            )
+            self._cond.notify_all()
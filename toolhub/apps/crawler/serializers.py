@@ -69,6 +69,11 @@ class RunUrlSerializer(ModelSerializer):
             "status_code",
             "redirected",
             "elapsed_ms",
+            "wait_ms",
+            "download_ms",
+            "parse_ms",
+            "validate_ms",
+            "db_ms",
             "schema",
             "valid",
             "logs",
@@ -93,5 +98,11 @@ class RunSerializer(ModelSerializer):
             "new_tools",
             "updated_tools",
             "total_tools",
+            "elapsed_ms",
+            "wait_ms",
+            "download_ms",
+            "parse_ms",
+            "validate_ms",
+            "db_ms",
         ]
         read_only_fields = fields
@@ -0,0 +1,173 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import codecs
+import hashlib
+import json
+import tempfile
+
+import requests
+
+
+CHUNK_SIZE = 64 * 1024
+# Response bodies larger than this are spooled to disk rather than memory
+SPOOL_MEMORY_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Response body exceeded the allowed size."""
+
+
+def spool_response(response, max_size, chunk_size=CHUNK_SIZE):
+    """Copy a streamed response body to a temporary file.
+
+    The body is read incrementally so that at most ``SPOOL_MEMORY_SIZE``
+    bytes are held in memory. The response is closed when done.
+
+    :param response: requests.Response made with ``stream=True``
+    :param max_size: Maximum allowed body size in bytes after decompression
+    :return: (file, sha256 hex digest) with the file positioned at the start
+    :raises ResponseTooLarge: if the body is larger than max_size
+    """
+    fp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    spooled = False
+    try:
+        length = response.headers.get("content-length", "")
+        if length.isdigit() and int(length) > max_size:
+            raise ResponseTooLarge(
+                "Content-Length {} exceeds {} bytes".format(length, max_size),
+                response=response,
+            )
+        for chunk in response.iter_content(chunk_size):
+            size += len(chunk)
+            if size > max_size:
+                raise ResponseTooLarge(
+                    "Response body exceeds {} bytes".format(max_size),
+                    response=response,
+                )
+            digest.update(chunk)
+            fp.write(chunk)
+        spooled = True
+    finally:
+        response.close()
+        if not spooled:
+            fp.close()
+    fp.seek(0)
+    return fp, digest.hexdigest()
+
+
+class _Buffer:
+    """Sliding window over a text stream for incremental JSON decoding."""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def error(self, msg):
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def read(self, size=0):
+        """Append at least size characters from the stream to the buffer."""
+        if self.pos > self.chunk_size and self.pos * 2 > len(self.buf):
+            # Drop data that has already been consumed
+            consumed = self.pos
+            self.buf = self.buf[consumed:]
+            self.pos = 0
+        try:
+            data = self.fp.read(max(size, self.chunk_size))
+        except UnicodeDecodeError as e:
+            msg = "Invalid text: {}".format(e)
+            raise self.error(msg)
+        if data:
+            self.buf += data
+        else:
+            self.eof = True
+
+    def peek(self):
+        """Skip whitespace and return the next character or "" at EOF."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            self.read()
+
+    def decode(self):
+        """Decode the JSON value starting at the next non-whitespace char."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Grow geometrically so large values decode in linear time
+                self.read(len(self.buf) - self.pos)
+                continue
+            if end == len(self.buf) and not self.eof:
+                # A number may continue in the next chunk
+                self.read()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(fp, chunk_size=CHUNK_SIZE):
+    """Decode the members of a JSON array one at a time.
+
+    Only the member currently being decoded is held in memory. A document
+    that is not an array is yielded as a single member. The encoding is
+    detected from the first bytes of the document as in ``json.loads``.
+
+    :param fp: Seekable binary file like object containing JSON encoded as
+        UTF-8, UTF-16 or UTF-32
+    :raises json.JSONDecodeError: if the document is malformed
+    """
+    encoding = requests.utils.guess_json_utf(fp.read(4)) or "utf-8"
+    fp.seek(0)
+    if encoding == "utf-8":
+        # Skip a byte order mark
+        encoding = "utf-8-sig"
+    reader = codecs.getreader(encoding)(fp)
+    buf = _Buffer(reader, chunk_size)
+    if buf.peek() != "[":
+        yield buf.decode()
+    else:
+        buf.pos += 1
+        if buf.peek() == "]":
+            buf.pos += 1
+        else:
+            while True:
+                yield buf.decode()
+                c = buf.peek()
+                buf.pos += 1
+                if c == "]":
+                    break
+                if c != ",":
+                    buf.pos -= 1
+                    raise buf.error("Expecting ',' delimiter")
+    if buf.peek() != "":
+        raise buf.error("Extra data")
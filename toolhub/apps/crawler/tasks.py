@@ -15,21 +15,42 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import collections
+import contextlib
+import datetime
+import hashlib
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import django.db
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Max
+from django.db.models import Q
+from django.db.models.functions import Mod
 from django.utils import timezone
 
 import requests
 
-from toolhub.apps.auditlog.context import auditlog_context
+from toolhub.apps.search import indexing
+from toolhub.apps.toolinfo import schema
 from toolhub.apps.toolinfo.models import Tool
 
 from .logging import CaptureCrawlLogs
 from .models import Run
+from .models import RunShard
 from .models import RunUrl
 from .models import Url
+from .ratelimit import HostRateLimiter
+from .ratelimit import interleave_by_host
+from .ratelimit import parse_retry_after
+from .stream import iter_json_array
+from .stream import spool_response
+from .timing import PhaseTimer
+from .timing import TIMING_FIELDS
 
 
 logger = logging.getLogger(__name__)
@@ -38,82 +59,442 @@ logger = logging.getLogger(__name__)
 class Crawler:
     """Toolinfo URL crawler."""
 
-    def __init__(self):
-        """Initialize a new instance."""
+    # Crawls are recorded as Runs, which all shards of a crawl must share
+    saves_runs = True
+
+    def __init__(
+        self,
+        max_workers=None,
+        crawl_all=False,
+        shard=None,
+        run_key=None,
+        resume=False,
+    ):
+        """Initialize a new instance.
+
+        :param max_workers: Maximum number of concurrent fetches. Defaults to
+            settings.CRAWLER_MAX_WORKERS.
+        :param crawl_all: Crawl all URLs, even those that are not due yet.
+        :param shard: (index, count) tuple. Only crawl the URLs belonging to
+            shard index of count shards.
+        :param run_key: Key identifying the Run shared by all shards of a
+            sharded crawl. Required when crawling one of several shards. A
+            new Run is created when not given.
+        :param resume: Continue an unfinished Run, skipping the URLs that it
+            has already completed.
+        """
         self.user_agent = "Toolhub toolinfo crawler"
+        if max_workers is None:
+            max_workers = settings.CRAWLER_MAX_WORKERS
+        self.max_workers = max(1, max_workers)
+        self.crawl_all = crawl_all
+        self.shard_index, self.shard_count = shard or (0, 1)
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError("Invalid shard {!r}".format(shard))
+        if self.saves_runs and self.shard_count > 1 and run_key is None:
+            # Each shard would create its own Run which never finishes
+            raise ValueError("A run key is required to crawl a shard")
+        self.run_key = run_key
+        self.resume = resume
+        self.limiter = None
+        self.session = None
+        self.timer = None
+        self.last_run_tools = {}
+        self.stale_urls = set()
 
     def crawl(self):  # noqa: R0912
         """Crawl all URLs and create/update tool records."""
         logger.info("Starting crawl")
-        run = Run()
-        run.save()
+        run = self.start_run()
         names_seen_in_run = {}
+        done = set()
+        if self.resume:
+            done = self.resume_run(run, names_seen_in_run)
+        urls = [url for url in self.get_active_urls() if url.pk not in done]
+        self.last_run_tools = self.toolinfo_in_last_run(urls)
+        self.stale_urls = self.urls_with_deleted_tools(urls)
 
-        for url in self.get_active_urls():
-            # FIXME: rate limiting for outbound requests?
-            run_url = RunUrl(run=run, url=url)
-            with CaptureCrawlLogs(run_url):
-                self.process_url(run_url, names_seen_in_run)
+        # Batch search index updates across URLs
+        with indexing.deferred():
+            for url, future in self.fetch_urls(urls):
+                run_url = RunUrl(run=run, url=url)
+                self.timer = PhaseTimer()
+                with self.capture_logs(run_url):
+                    self.process_url(run_url, names_seen_in_run, future)
+                    self.timer.record(run_url)
+                self.checkpoint(run_url)
 
-        run.end_date = timezone.now()
-        run.save()
+        self.finish_run(run)
         return run
 
-    def process_url(self, run_url, seen):
-        """Crawl a URL and update the run."""
-        logger.info("Crawling %s", run_url.url.url)
-        expected_names = self.toolinfo_in_last_run(run_url.url)
-        toolinfo_list = self.fetch_content(run_url)
-        run_url.save()
+    def start_run(self):
+        """Create or join the Run for this crawl.
 
-        for toolinfo in toolinfo_list:
-            if not self.validate_toolinfo(toolinfo):
-                if run_url.valid:
-                    # Mark URL as invalid if any of it's contained tools is
-                    # invalid in this run.
-                    run_url.valid = False
-                    run_url.save()
-                continue
+        Shards of a sharded crawl all join the Run with the same key. When
+        resuming without a key the most recent unkeyed Run is continued if
+        it did not finish. The counters of the returned Run start at zero
+        and count only the work done by this process since the last
+        checkpoint.
 
-            logger.info(
-                "Found toolinfo %s at %s",
-                toolinfo["name"],
-                run_url.url.url,
+        Duplicate toolinfo records (T278065) are only detected within a
+        shard, so a tool listed at URLs in different shards may be updated
+        from either URL.
+        """
+        if self.run_key is not None:
+            run, _ = Run.objects.get_or_create(
+                key=self.run_key, defaults={"shards": self.shard_count}
             )
-            if toolinfo["name"] in seen:
-                # T278065: Reject updates from multiple urls in same run
-                logger.error(
-                    "Toolinfo %s already seen at %s",
-                    toolinfo["name"],
-                    seen[toolinfo["name"]],
+            if run.end_date is not None:
+                raise ValueError("Run {} has already finished".format(run.key))
+        else:
+            run = None
+            if self.resume:
+                run = (
+                    Run.objects.filter(key__isnull=True)
+                    .order_by("-id")
+                    .first()
                 )
-                expected_names.discard(toolinfo["name"])
-                continue
-            seen[toolinfo["name"]] = run_url.url.url
+            if run is None or run.end_date is not None:
+                run = Run(shards=self.shard_count)
+                run.save()
+                return run
+        if run.shards != self.shard_count:
+            raise ValueError(
+                "Run {} has {} shards, not {}".format(
+                    run, run.shards, self.shard_count
+                )
+            )
+        logger.info(
+            "Joined run %s as shard %d/%d",
+            run,
+            self.shard_index,
+            self.shard_count,
+        )
+        run.new_tools = 0
+        run.updated_tools = 0
+        run.total_tools = 0
+        return run
+
+    def resume_run(self, run, seen):
+        """Prepare to continue a Run that was interrupted.
+
+        The toolinfo records found at URLs that were completed by the Run
+        are added to seen. URLs that were only partly processed are reset so
+        that they will be fully crawled again.
+
+        :param run: Run being resumed
+        :param seen: dict of toolinfo name to url to update
+        :return: set of ids of Urls that do not need to be crawled again
+        """
+        shard_urls = self.get_shard_urls()
+        partial = RunUrl.objects.filter(
+            run=run, completed=False, url__in=shard_urls
+        )
+        # Cached state may describe content whose RunUrl is being discarded
+        Url.objects.filter(pk__in=partial.values("url")).update(
+            etag=None,
+            last_modified=None,
+            content_hash=None,
+            record_hashes={},
+        )
+        partial.delete()
+        completed = RunUrl.objects.filter(run=run, url__in=shard_urls)
+        seen.update(
+            RunUrl.tools.through.objects.filter(runurl__in=completed)
+            .order_by("runurl")
+            .values_list("tool__name", "runurl__url__url")
+        )
+        done = set(completed.values_list("url", flat=True))
+        if done:
+            logger.info("Skipping %d urls completed in %s", len(done), run)
+        return done
+
+    def checkpoint(self, run_url):
+        """Mark a RunUrl as completed and add its counters to the Run.
+
+        Counters are incremented in the database so that shards working at
+        the same time do not overwrite each other's results, and so that the
+        work done so far is kept if the crawl is interrupted.
+        """
+        run = run_url.run
+        with transaction.atomic():
+            RunUrl.objects.filter(pk=run_url.pk).update(completed=True)
+            Run.objects.filter(pk=run.pk).update(
+                new_tools=F("new_tools") + run.new_tools,
+                updated_tools=F("updated_tools") + run.updated_tools,
+                total_tools=F("total_tools") + run.total_tools,
+                **{
+                    field: F(field) + getattr(run_url, field)
+                    for field in TIMING_FIELDS
+                },
+            )
+        run_url.completed = True
+        run.new_tools = 0
+        run.updated_tools = 0
+        run.total_tools = 0
+
+    def finish_run(self, run):
+        """Record that this shard is done and end the Run if complete.
+
+        Each shard is counted once, even if it is crawled again with the
+        same run key before the other shards finish.
+        """
+        with transaction.atomic():
+            _, created = RunShard.objects.get_or_create(
+                run=run, shard=self.shard_index
+            )
+            if created:
+                Run.objects.filter(pk=run.pk).update(
+                    shards_done=F("shards_done") + 1,
+                )
+        Run.objects.filter(
+            pk=run.pk,
+            end_date__isnull=True,
+            shards_done__gte=F("shards"),
+        ).update(end_date=timezone.now())
+        run.refresh_from_db()
+
+    def fetch_urls(self, urls):
+        """Fetch URLs concurrently.
+
+        URLs are submitted to a bounded pool of worker threads, interleaved
+        by host so that a few large hosts do not monopolize the pool.
+        Requests to each host are further limited by a HostRateLimiter and
+        share keep-alive connections through a single requests.Session.
+        Results are yielded in the same order as the input so that callers
+        see a deterministic sequence (T278065: first url wins) no matter
+        which remote server answers first. Database access must stay in the
+        calling thread.
+
+        At most twice as many fetches as there are workers are submitted
+        ahead of the caller, so downloaded bodies waiting to be processed
+        do not pile up. Fetches that have not been consumed when the
+        generator is closed are cancelled.
+
+        :param urls: Iterable of Url instances
+        :returns: Generator of (url (Url), response (Future)) tuples
+        """
+        urls = list(urls)
+        self.limiter = HostRateLimiter(
+            max_concurrent=settings.CRAWLER_PER_HOST_MAX_WORKERS,
+            delay=settings.CRAWLER_PER_HOST_DELAY,
+        )
+        window = 2 * self.max_workers
+        unsubmitted = collections.OrderedDict(
+            (url.pk, url)
+            for url in interleave_by_host(urls, key=lambda u: u.url)
+        )
+        futures = {}
+        with self.make_session() as self.session, ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="crawler",
+        ) as pool:
+
+            def submit(url):
+                del unsubmitted[url.pk]
+                futures[url.pk] = pool.submit(self.fetch, url)
 
             try:
-                obj, created, updated = Tool.objects.from_toolinfo(
-                    toolinfo,
-                    run_url.url.created_by,
-                    Tool.ORIGIN_CRAWLER,
-                    "Import from {}".format(run_url.url.url),
+                for url in urls:
+                    while unsubmitted and len(futures) < window:
+                        submit(next(iter(unsubmitted.values())))
+                    if url.pk in unsubmitted:
+                        # Needed now even though the window is full
+                        submit(url)
+                    yield url, futures.pop(url.pk)
+            finally:
+                for future in futures.values():
+                    if not future.cancel():
+                        future.add_done_callback(self.discard_fetch)
+
+    def discard_fetch(self, future):
+        """Release the response of a fetch that will not be processed."""
+        try:
+            r, body, _ = future.result()
+        except requests.exceptions.RequestException:
+            return
+        if body is not None:
+            body[0].close()
+        r.close()
+
+    def make_session(self):
+        """Create an HTTP session for fetching URLs.
+
+        Connections are pooled per host and kept alive between requests.
+        The pool for each host is sized to match the number of parallel
+        requests that the HostRateLimiter allows for a host.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=settings.CRAWLER_PER_HOST_MAX_WORKERS,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(
+            {
+                "user-agent": self.user_agent,
+                # Decoded transparently by requests
+                "accept-encoding": "gzip, deflate",
+            }
+        )
+        return session
+
+    def fetch(self, url):
+        """Fetch a URL. Called from a worker thread.
+
+        :returns: (response, body, timer) where body is a file containing
+            the response content for successful responses other than 304
+            and None otherwise and timer is a PhaseTimer for the wait and
+            download phases.
+        """
+        timer = PhaseTimer()
+        headers = {}
+        # Make a conditional request if we have validators from a prior run
+        # and every tool found in that run still exists
+        if url.pk not in self.stale_urls:
+            if url.etag:
+                headers["if-none-match"] = url.etag
+            if url.last_modified:
+                headers["if-modified-since"] = url.last_modified
+
+        retried = False
+        while True:
+            start = time.perf_counter()
+            with self.limiter.slot(url.url):
+                timer.add("wait", time.perf_counter() - start)
+                r = self.session.get(
+                    url.url,
+                    headers=headers,
+                    stream=True,
+                    timeout=(
+                        settings.CRAWLER_CONNECT_TIMEOUT,
+                        settings.CRAWLER_READ_TIMEOUT,
+                    ),
                 )
-                if created:
-                    run_url.run.new_tools += 1
-                if updated:
-                    run_url.run.updated_tools += 1
-                run_url.run.total_tools += 1
-                run_url.tools.add(obj)
-                expected_names.discard(obj.name)
-
-            except django.db.Error:
-                logger.exception(
-                    "Failed to upsert `%s` from %s",
+                if r.ok and r.status_code != 304:
+                    with timer("download"):
+                        body = spool_response(
+                            r, settings.CRAWLER_MAX_RESPONSE_SIZE
+                        )
+                    return r, body, timer
+                r.close()
+            if r.status_code not in (429, 503):
+                return r, None, timer
+            delay = parse_retry_after(r.headers.get("retry-after"))
+            if delay is None:
+                return r, None, timer
+            # Back off from this host for everyone
+            self.limiter.defer(url.url, delay)
+            if retried or delay > settings.CRAWLER_MAX_RETRY_AFTER:
+                return r, None, timer
+            retried = True
+
+    def process_url(self, run_url, seen, response):
+        """Crawl a URL and update the run."""
+        logger.info("Crawling %s", run_url.url.url)
+        current = self.last_run_tools.get(run_url.url.pk, {})
+        expected_names = set(current)
+        toolinfo_list = self.fetch_content(run_url, response)
+        self.save_run_url(run_url)
+        fetch_failed = not run_url.valid
+        changed = False
+
+        if toolinfo_list is None:
+            logger.info("Not modified since last crawl")
+            with self.timer("db"):
+                self.carry_forward_last_run(run_url, seen, current)
+            self.schedule_next_crawl(run_url.url, changed, fetch_failed)
+            self.save_url_state(run_url)
+            return
+
+        prior_hashes = run_url.url.record_hashes or {}
+        record_hashes = {}
+        tools = []
+        pending = []
+        # Existing tools whose records failed validation in this run
+        rejected = {}
+
+        try:
+            for toolinfo in self.timer.iterate("parse", toolinfo_list):
+                with self.timer("validate"):
+                    is_valid = self.validate_toolinfo(toolinfo)
+                if not is_valid:
+                    if run_url.valid:
+                        # Mark URL as invalid if any of it's contained tools is
+                        # invalid in this run.
+                        run_url.valid = False
+                        self.save_run_url(run_url)
+                    name = self.toolinfo_name(toolinfo)
+                    if name in expected_names and run_url.url.url not in (
+                        # seen holds names as they were written in records
+                        seen.get(name),
+                        seen.get(toolinfo["name"]),
+                    ):
+                        # Still listed, so keep the tool as it was
+                        logger.warning(
+                            "Keeping %s unchanged after invalid record", name
+                        )
+                        expected_names.discard(name)
+                        rejected[name] = current[name]
+                    continue
+
+                logger.info(
+                    "Found toolinfo %s at %s",
                     toolinfo["name"],
                     run_url.url.url,
                 )
-                run_url.valid = False
-                run_url.save()
+                if toolinfo["name"] in seen:
+                    # T278065: Reject updates from multiple urls in same run
+                    logger.error(
+                        "Toolinfo %s already seen at %s",
+                        toolinfo["name"],
+                        seen[toolinfo["name"]],
+                    )
+                    expected_names.discard(toolinfo["name"])
+                    continue
+                seen[toolinfo["name"]] = run_url.url.url
+                # A valid record wins over an invalid one for the same tool
+                rejected.pop(self.toolinfo_name(toolinfo), None)
+
+                record = Tool.objects.normalize_toolinfo(toolinfo)
+                name = record["name"]
+                digest = self.toolinfo_digest(record)
+                # current only holds live tools, so the record of a deleted
+                # tool is always upserted and the tool restored
+                if name in current:
+                    pk, modified = current[name]
+                    if prior_hashes.get(name) == [digest, modified]:
+                        # Identical to the record we stored last time and the
+                        # Tool has not been changed by anyone else since.
+                        record_hashes[name] = prior_hashes[name]
+                        run_url.run.total_tools += 1
+                        tools.append(pk)
+                        expected_names.discard(name)
+                        continue
+                pending.append((record, digest))
+        except json.JSONDecodeError:
+            logger.exception("Failed to parse JSON from %s", run_url.url.url)
+            run_url.valid = False
+            self.save_run_url(run_url)
+            fetch_failed = True
+            # Keep tools we did not get to rather than deleting them
+            unread = expected_names - {r["name"] for r, _ in pending}
+            with self.timer("db"):
+                self.carry_forward_last_run(
+                    run_url, seen, {name: current[name] for name in unread}
+                )
+            expected_names.clear()
+
+        with self.timer("db"):
+            if pending:
+                upserted, changed = self.upsert_toolinfo(
+                    run_url, pending, expected_names, record_hashes
+                )
+                tools.extend(upserted)
+            self.add_run_url_tools(run_url, tools)
+            if rejected:
+                self.carry_forward_last_run(run_url, seen, rejected)
 
         if len(expected_names) > 0:
             logger.info(
@@ -121,67 +502,414 @@ class Crawler:
             )
             if 200 <= run_url.status_code <= 299 or run_url.status_code == 404:
                 # T271128: delete missing tools
-                reason = "Toolinfo removed from {}"
-                if run_url.status_code == 404:
-                    reason = "Url {} not found during crawl"
-                try:
-                    with auditlog_context(
-                        run_url.url.created_by, reason.format(run_url.url.url)
-                    ):
-                        Tool.objects.filter(name__in=expected_names).delete()
-                except django.db.Error:
-                    logger.exception(
-                        "Failed to delete missing tools: %s", expected_names
-                    )
+                with self.timer("db"):
+                    if self.delete_missing_tools(run_url, expected_names):
+                        changed = True
+
+        run_url.url.record_hashes = record_hashes
+        self.schedule_next_crawl(run_url.url, changed, fetch_failed)
+        self.save_url_state(run_url)
+
+    def upsert_toolinfo(self, run_url, pending, expected_names, hashes):
+        """Create or update Tools for the new or changed records of a URL.
+
+        :param run_url: RunUrl being processed
+        :param pending: List of (record, digest) tuples
+        :param expected_names: Names of tools still missing from the URL
+        :param hashes: Dict of record digests to update
+        :returns: (tools (list), has_changes (boolean))
+        :rtype: tuple
+        """
+        records = [record for record, _ in pending]
+        names = [record["name"] for record in records]
+        # Do not treat tools we were unable to save as missing
+        expected_names.difference_update(names)
+        try:
+            results = Tool.objects.bulk_from_toolinfo(
+                records,
+                run_url.url.created_by,
+                Tool.ORIGIN_CRAWLER,
+                "Import from {}".format(run_url.url.url),
+            )
+        except django.db.Error:
+            logger.exception(
+                "Failed to upsert %s from %s", names, run_url.url.url
+            )
+            run_url.valid = False
+            self.save_run_url(run_url)
+            return [], False
+
+        tools = []
+        has_changes = False
+        for (_, digest), result in zip(pending, results):
+            if result is None:
+                run_url.valid = False
+                continue
+            obj, created, updated = result
+            if created:
+                run_url.run.new_tools += 1
+            if updated:
+                run_url.run.updated_tools += 1
+            has_changes = has_changes or created or updated
+            run_url.run.total_tools += 1
+            tools.append(obj)
+            hashes[obj.name] = [digest, obj.modified_date.isoformat()]
+        if not run_url.valid:
+            self.save_run_url(run_url)
+        return tools, has_changes
+
+    def delete_missing_tools(self, run_url, names):
+        """Delete tools that are no longer listed at a URL.
+
+        :returns: True if the tools were deleted
+        """
+        reason = "Toolinfo removed from {}"
+        if run_url.status_code == 404:
+            reason = "Url {} not found during crawl"
+        try:
+            Tool.objects.bulk_soft_delete(
+                names, run_url.url.created_by, reason.format(run_url.url.url)
+            )
+        except django.db.Error:
+            logger.exception("Failed to delete missing tools: %s", names)
+            return False
+        return True
+
+    def carry_forward_last_run(self, run_url, seen, last_tools):
+        """Associate an unchanged URL with the tools found in its last run."""
+        tools = []
+        for name, (pk, _) in last_tools.items():
+            if name in seen:
+                logger.error(
+                    "Toolinfo %s already seen at %s", name, seen[name]
+                )
+                continue
+            seen[name] = run_url.url.url
+            tools.append(pk)
+        self.add_run_url_tools(run_url, tools)
+        run_url.run.total_tools += len(tools)
+
+    def schedule_next_crawl(self, url, changed, failed):
+        """Decide when a URL should be crawled again.
+
+        URLs whose content changes are crawled more often and URLs whose
+        content stays the same are crawled less often, within the bounds of
+        CRAWLER_MIN_INTERVAL and CRAWLER_MAX_INTERVAL. Fetch failures back
+        off exponentially without changing the learned interval.
+        """
+        low = settings.CRAWLER_MIN_INTERVAL
+        high = settings.CRAWLER_MAX_INTERVAL
+        interval = url.crawl_interval
+        if interval is None:
+            interval = low
+
+        if failed:
+            url.consecutive_failures += 1
+            delay = interval * 2 ** min(url.consecutive_failures, 16)
+        else:
+            url.consecutive_failures = 0
+            if changed:
+                interval = interval // 2
+            else:
+                interval = interval * 2
+            interval = min(high, max(low, interval))
+            delay = interval
+
+        url.crawl_interval = interval
+        url.next_crawl_date = timezone.now() + datetime.timedelta(
+            seconds=min(high, delay)
+        )
+
+    def capture_logs(self, run_url):
+        """Get a context manager that collects logs for a RunUrl."""
+        return CaptureCrawlLogs(run_url)
+
+    def save_run_url(self, run_url):
+        """Persist a RunUrl."""
+        run_url.save()
+
+    def add_run_url_tools(self, run_url, tools):
+        """Record the tools found at a RunUrl."""
+        if tools:
+            run_url.tools.add(*tools)
+
+    def save_url_state(self, run_url):
+        """Persist cache validators and schedule for a URL."""
+        url = run_url.url
+        if not run_url.valid:
+            # Force a full fetch next time so errors are reported again
+            url.etag = None
+            url.last_modified = None
+            url.content_hash = None
+        # Update directly to avoid auditlog noise from Url.save()
+        Url.objects.filter(pk=url.pk).update(
+            etag=url.etag,
+            last_modified=url.last_modified,
+            content_hash=url.content_hash,
+            record_hashes=url.record_hashes,
+            crawl_interval=url.crawl_interval,
+            consecutive_failures=url.consecutive_failures,
+            next_crawl_date=url.next_crawl_date,
+        )
+
+    def read_toolinfo(self, fp):
+        """Decode toolinfo records one at a time from a file."""
+        with fp:
+            yield from iter_json_array(fp)
+
+    def toolinfo_name(self, toolinfo):
+        """Get the normalized Tool name of a toolinfo record.
+
+        :returns: name or None if the record has no name
+        """
+        if isinstance(toolinfo, dict) and isinstance(
+            toolinfo.get("name"), str
+        ):
+            return Tool.objects.normalize_name(toolinfo["name"])
+        return None
+
+    def toolinfo_digest(self, record):
+        """Compute a stable digest of a normalized toolinfo record."""
+        blob = json.dumps(record, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def toolinfo_in_last_run(self, urls):
+        """Find the toolinfo records in the most recent run for each url.
+
+        Only completed crawls of a url count. A RunUrl left behind by an
+        interrupted run may be missing some or all of the url's tools.
+        Uses a single query for all urls rather than two queries per url.
+
+        :param urls: Url instances to look up
+        :return: dict of url id to dict of tool name to (pk, modified date)
+        """
+        rows = (
+            RunUrl.tools.through.objects.filter(
+                runurl__in=self.last_completed_runs(urls),
+                tool__deleted__isnull=True,
+            )
+            .values_list(
+                "runurl__url",
+                "tool__name",
+                "tool",
+                "tool__modified_date",
+            )
+            .distinct()
+        )
+        found = {}
+        for url_id, name, pk, modified in rows:
+            found.setdefault(url_id, {})[name] = (pk, modified.isoformat())
+        return found
+
+    def urls_with_deleted_tools(self, urls):
+        """Find the urls whose most recent run found a tool deleted since.
+
+        The content of these urls is fetched and read in full even if it is
+        unchanged so that the deleted tools are restored from their records.
+
+        :param urls: Url instances to look up
+        :return: set of url ids
+        """
+        return set(
+            RunUrl.tools.through.objects.filter(
+                runurl__in=self.last_completed_runs(urls),
+                tool__deleted__isnull=False,
+            ).values_list("runurl__url", flat=True)
+        )
 
-    def toolinfo_in_last_run(self, url):
-        """Find the toolinfo records in the most recent run for a url."""
-        expected = set()
-        last_run = url.crawler_runs.order_by("-id").first()
-        if last_run:
-            qs = last_run.tools.filter(deleted__isnull=True).distinct()
-            expected.update(qs.values_list("name", flat=True))
-        return expected
+    def last_completed_runs(self, urls):
+        """Query the ids of the most recent completed RunUrl of each url."""
+        return (
+            RunUrl.objects.filter(
+                url__in=[url.pk for url in urls], completed=True
+            )
+            .values("url")
+            .annotate(last_id=Max("id"))
+            .values("last_id")
+        )
 
     def validate_toolinfo(self, toolinfo):
-        """Determine if a record is valid."""
+        """Determine if a record is valid.
+
+        The record is checked against the version of the toolinfo schema
+        named by its $schema, and each problem found is logged.
+        """
+        if not isinstance(toolinfo, dict):
+            logger.error("Toolinfo record is not an object.")
+            return False
+        name = toolinfo.get("name", "")
         is_valid = True
-        # FIXME: do a more complete job of validating the record
         for field in ["name", "title", "description", "url"]:
-            if field not in toolinfo or not toolinfo[field]:
-                logger.error(
-                    "Toolinfo record %s missing %s.",
-                    toolinfo.get("name", ""),
-                    field,
-                )
+            if field in toolinfo and not toolinfo[field]:
+                logger.error("Toolinfo record %s missing %s.", name, field)
                 is_valid = False
+
+        # The schema describes $schema and $language by their field names
+        record = dict(toolinfo)
+        for key in ("$schema", "$language"):
+            if key in record:
+                record["_" + key[1:]] = record.pop(key)
+        version = schema.version_for(toolinfo.get("$schema"))
+        validator = schema.record_validator(version)
+        for error in validator.iter_errors(record):
+            message = error.message
+            if len(message) > 200:
+                message = message[:200] + "..."
+            logger.error(
+                "Toolinfo record %s invalid against schema %s at /%s: %s",
+                name,
+                version,
+                "/".join(str(p) for p in error.absolute_path),
+                message,
+            )
+            is_valid = False
         return is_valid
 
+    def get_shard_urls(self):
+        """Get all URLs in this crawler's shard."""
+        qs = Url.objects.all()
+        if self.shard_count > 1:
+            qs = qs.annotate(shard=Mod("id", self.shard_count)).filter(
+                shard=self.shard_index
+            )
+        return qs
+
     def get_active_urls(self):
         """Get all URLs ready for crawling."""
-        # FIXME: filter out "failed" urls?
-        return Url.objects.all()
+        qs = self.get_shard_urls()
+        if not self.crawl_all:
+            qs = qs.filter(
+                Q(next_crawl_date__isnull=True)
+                | Q(next_crawl_date__lte=timezone.now())
+            )
+        return qs.order_by("id")
+
+    def fetch_content(self, url, response):
+        """Wait for a fetched URL and return it's content.
 
-    def fetch_content(self, url):
-        """Crawl a URL and return it's content."""
+        :returns: Iterable of toolinfo records or None if the content is
+            unchanged since the last valid crawl. Records are decoded as they
+            are iterated and json.JSONDecodeError is raised if the content is
+            malformed.
+        """
         raw_url = url.url.url
-        r = requests.get(raw_url, headers={"user-agent": self.user_agent})
+        try:
+            r, body, timer = response.result()
+        except requests.exceptions.RequestException:
+            logger.exception("Failed to fetch %s", raw_url)
+            url.status_code = 0
+            url.valid = False
+            return []
         url.status_code = r.status_code
         if r.history:
             url.redirected = True
-        url.elapsed_ms = r.elapsed.microseconds
+        self.timer.merge(timer)
+        self.timer.add("elapsed", r.elapsed.total_seconds())
+        if r.status_code == 304:
+            # No body to read, release the connection
+            r.close()
+            # Validators are only stored for valid content
+            url.valid = True
+            return None
+        url.url.etag = r.headers.get("etag")
+        url.url.last_modified = r.headers.get("last-modified")
         if r.ok:
-            try:
-                tools = r.json()
-                # FIXME: validate schema for entire file?
+            fp, content_hash = body
+            if (
+                content_hash == url.url.content_hash
+                and url.url.pk not in self.stale_urls
+            ):
+                # Byte-identical to the last valid crawl
+                fp.close()
                 url.valid = True
-                if not isinstance(tools, list):
-                    tools = [tools]
-                return tools
-            except json.decoder.JSONDecodeError:
-                logger.exception("Failed to parse JSON from %s", raw_url)
-                url.valid = False
-                return []
+                return None
+            url.url.content_hash = content_hash
+            # FIXME: validate schema for entire file?
+            url.valid = True
+            return self.read_toolinfo(fp)
 
         logger.error("Failed to fetch %s: %s", url.url, r)
         return []
+
+
+class DryRunCrawler(Crawler):
+    """Report the changes that a crawl would make without making them.
+
+    URLs are fetched, validated and compared with the database as in
+    a normal crawl, but nothing is written. No Run or RunUrl rows,
+    revisions, auditlog entries or search index updates are created.
+    """
+
+    saves_runs = False
+
+    def __init__(self, max_workers=None, crawl_all=False, shard=None):
+        """Initialize a new instance."""
+        super().__init__(
+            max_workers=max_workers, crawl_all=crawl_all, shard=shard
+        )
+        self.report = []
+        self.current = None
+
+    def start_run(self):
+        """Create an unsaved Run to collect counters in."""
+        return Run(shards=self.shard_count)
+
+    def checkpoint(self, run_url):
+        """Do nothing."""
+
+    def finish_run(self, run):
+        """Do nothing."""
+
+    def capture_logs(self, run_url):
+        """Leave logs to the normal logging configuration."""
+        return contextlib.nullcontext()
+
+    def save_run_url(self, run_url):
+        """Do nothing."""
+
+    def add_run_url_tools(self, run_url, tools):
+        """Do nothing."""
+
+    def save_url_state(self, run_url):
+        """Do nothing."""
+
+    def process_url(self, run_url, seen, response):
+        """Crawl a URL and add the changes it would make to the report."""
+        self.current = {
+            "url": run_url.url.url,
+            "create": [],
+            "update": {},
+            "delete": [],
+            "reject": [],
+        }
+        super().process_url(run_url, seen, response)
+        self.current["status_code"] = run_url.status_code
+        self.current["valid"] = run_url.valid
+        self.report.append(self.current)
+
+    def upsert_toolinfo(self, run_url, pending, expected_names, hashes):
+        """Compare new or changed records with the database."""
+        records = [record for record, _ in pending]
+        expected_names.difference_update(record["name"] for record in records)
+        has_changes = False
+        for name, action, changes in Tool.objects.diff_toolinfo(
+            records, run_url.url.created_by, Tool.ORIGIN_CRAWLER
+        ):
+            if action == "reject":
+                run_url.valid = False
+                self.current["reject"].append(name)
+                continue
+            run_url.run.total_tools += 1
+            if action == "create":
+                run_url.run.new_tools += 1
+                self.current["create"].append(name)
+            elif action != "unchanged":
+                run_url.run.updated_tools += 1
+                self.current["update"][name] = changes
+            has_changes = has_changes or action != "unchanged"
+        return [], has_changes
+
+    def delete_missing_tools(self, run_url, names):
+        """Report the tools that would be deleted."""
+        self.current["delete"].extend(sorted(names))
+        return True
@@ -0,0 +1,104 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+
+from elasticsearch_dsl.connections import connections
+
+import requests
+
+from toolhub.apps.search.documents import ToolDocument
+
+from ..benchmark import ToolinfoServer
+from ..benchmark import generate_documents
+from ..models import Run
+from ..models import Url
+
+
+class ToolinfoServerTest(TestCase):
+    """Test the synthetic toolinfo server."""
+
+    def test_server(self):
+        """Generated documents are served."""
+        docs = generate_documents(
+            20, max_latency=0, error_rate=0.2, redirect_rate=0.2, seed=1
+        )
+        with ToolinfoServer(docs) as server:
+            urls = server.urls()
+            self.assertEqual(len(urls), 20)
+            statuses = set()
+            for url in urls:
+                r = requests.get(url)
+                statuses.add(r.status_code)
+                if r.ok:
+                    self.assertTrue(r.json()[0]["name"].startswith("bench-"))
+                    r = requests.get(
+                        r.url, headers={"if-none-match": r.headers["etag"]}
+                    )
+                    self.assertEqual(r.status_code, 304)
+        self.assertIn(200, statuses)
+        self.assertTrue(statuses - {200})
+
+    def test_command(self):
+        """The benchmark crawls and leaves the database untouched."""
+        out = io.StringIO()
+        call_command(
+            "crawl_benchmark",
+            urls=5,
+            records=3,
+            latency=0,
+            runs=2,
+            stdout=out,
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("records/s", lines[1])
+        self.assertEqual(Url.objects.count(), 0)
+        self.assertEqual(Run.objects.count(), 0)
+
+    @override_settings(ELASTICSEARCH_DSL_AUTOSYNC=True)
+    def test_command_with_search(self):
+        """Search updates go to a throwaway index which is deleted."""
+        client = mock.MagicMock()
+        with mock.patch.object(
+            connections, "get_connection", return_value=client
+        ), mock.patch.object(
+            ToolDocument, "bulk", return_value=(0, [])
+        ) as bulk:
+            call_command(
+                "crawl_benchmark",
+                urls=3,
+                records=2,
+                latency=0,
+                error_rate=0,
+                redirect_rate=0,
+                runs=1,
+                with_search=True,
+                stdout=io.StringIO(),
+            )
+        name = client.indices.create.call_args[1]["index"]
+        self.assertTrue(name.startswith("tools-benchmark-"))
+        bulk.assert_called()
+        for action in bulk.call_args[0][0]:
+            self.assertEqual(action["_index"], name)
+        client.indices.delete.assert_called_once_with(index=name, ignore=404)
+        self.assertEqual(ToolDocument._index._name, "tools")
@@ -16,9 +16,11 @@
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
 import logging
+import threading
 
 from django.test import SimpleTestCase
 
+from ..logging import ContextLogHandler
 from ..logging import LogCaptureContext
 
 
@@ -40,3 +42,48 @@ class LogCaptureContextTest(SimpleTestCase):
         self.assertEqual(2, len(log_lines))
         self.assertIn("3. should be captured", log_lines[0])
         self.assertIn("4. should be captured", log_lines[1])
+
+    def test_nested(self):
+        """Nested contexts each capture records."""
+        logger = logging.getLogger("test_nested")
+        logger.setLevel(logging.DEBUG)
+        with LogCaptureContext(level=logging.INFO) as outer:
+            with LogCaptureContext(logger=logger) as inner:
+                logger.debug("1. inner only")
+                logger.info("2. both")
+                self.assertEqual(2, len(inner.getvalue().splitlines()))
+            logger.info("3. outer only")
+            outer_lines = outer.getvalue().splitlines()
+        self.assertEqual(2, len(outer_lines))
+        self.assertIn("2. both", outer_lines[0])
+        self.assertIn("3. outer only", outer_lines[1])
+
+    def test_threads(self):
+        """Each thread captures only its own records."""
+        logger = logging.getLogger("test_threads")
+        logger.setLevel(logging.DEBUG)
+        barrier = threading.Barrier(4)
+        results = {}
+
+        def work(n):
+            with LogCaptureContext(logger=logger) as ctx:
+                barrier.wait()
+                for i in range(10):
+                    logger.info("thread %d record %d", n, i)
+                barrier.wait()
+                results[n] = ctx.getvalue().splitlines()
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for n in range(4):
+            self.assertEqual(10, len(results[n]))
+            for line in results[n]:
+                self.assertIn("thread {} ".format(n), line)
+        # The handler is installed once and left in place
+        self.assertEqual(
+            1,
+            sum(isinstance(h, ContextLogHandler) for h in logger.handlers),
+        )
@@ -17,6 +17,7 @@
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
 
 from ..models import Url
 
@@ -32,3 +33,44 @@ class UrlTestCase(TestCase):
             created_by=user,
         )
         self.assertEqual(str(url), url.url)
+
+    def test_change_url_resets_crawl_state(self):
+        """Changing the address forgets validators and scheduling."""
+        user = get_user_model().objects.create_user("testing")
+        url = Url.objects.create(
+            url="https://example.org/toolinfo.json",
+            created_by=user,
+        )
+        state = {
+            "etag": '"abc"',
+            "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "content_hash": "0" * 64,
+            "record_hashes": {"tool": ["0" * 64, "2020-01-01"]},
+            "next_crawl_date": timezone.now(),
+            "crawl_interval": 86400,
+            "consecutive_failures": 3,
+        }
+        Url.objects.filter(pk=url.pk).update(**state)
+
+        url = Url.objects.get(pk=url.pk)
+        url.save()
+        url.refresh_from_db()
+        self.assertEqual(url.etag, state["etag"])
+        self.assertEqual(url.consecutive_failures, 3)
+
+        url = Url.objects.get(pk=url.pk)
+        url.url = "https://example.org/other.json"
+        url.save()
+        url.refresh_from_db()
+        self.assertEqual(
+            {field: getattr(url, field) for field in state},
+            {
+                "etag": None,
+                "last_modified": None,
+                "content_hash": None,
+                "record_hashes": {},
+                "next_crawl_date": None,
+                "crawl_interval": None,
+                "consecutive_failures": 0,
+            },
+        )
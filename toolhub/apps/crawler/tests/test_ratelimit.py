@@ -0,0 +1,114 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..ratelimit import HostRateLimiter
+from ..ratelimit import interleave_by_host
+from ..ratelimit import parse_retry_after
+
+
+class InterleaveByHostTest(SimpleTestCase):
+    """Test interleave_by_host."""
+
+    def test_round_robin(self):
+        """Assert hosts are interleaved and per-host order is kept."""
+        urls = [
+            "https://a.example/1",
+            "https://a.example/2",
+            "https://a.example/3",
+            "https://b.example/1",
+            "https://B.example/2",
+            "https://c.example/1",
+        ]
+        self.assertEqual(
+            list(interleave_by_host(urls)),
+            [
+                "https://a.example/1",
+                "https://b.example/1",
+                "https://c.example/1",
+                "https://a.example/2",
+                "https://B.example/2",
+                "https://a.example/3",
+            ],
+        )
+
+
+class ParseRetryAfterTest(SimpleTestCase):
+    """Test parse_retry_after."""
+
+    def test_seconds(self):
+        """Assert delta-seconds values are parsed."""
+        self.assertEqual(parse_retry_after("120"), 120)
+
+    def test_http_date(self):
+        """Assert dates in the past do not produce negative delays."""
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+    def test_invalid(self):
+        """Assert invalid values are ignored."""
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class HostRateLimiterTest(SimpleTestCase):
+    """Test HostRateLimiter."""
+
+    def test_concurrency(self):
+        """Assert no more than max_concurrent requests run per host."""
+        limiter = HostRateLimiter(max_concurrent=2)
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def work(url):
+            with limiter.slot(url):
+                with lock:
+                    active.append(url)
+                    peak.append(active.count(url))
+                time.sleep(0.01)
+                with lock:
+                    active.remove(url)
+
+        threads = [
+            threading.Thread(target=work, args=("https://a.example/",))
+            for _ in range(6)
+        ]
+        threads.append(
+            threading.Thread(target=work, args=("https://b.example/",))
+        )
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(max(peak), 2)
+
+    def test_defer(self):
+        """Assert deferring a host delays the next request."""
+        limiter = HostRateLimiter()
+        limiter.defer("https://a.example/", 0.05)
+        start = time.monotonic()
+        with limiter.slot("https://a.example/x"):
+            pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        start = time.monotonic()
+        with limiter.slot("https://b.example/"):
+            pass
+        self.assertLess(time.monotonic() - start, 0.04)
@@ -0,0 +1,85 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import io
+import json
+
+from django.test import SimpleTestCase
+
+from ..stream import iter_json_array
+
+
+class IterJsonArrayTest(SimpleTestCase):
+    """Test iter_json_array."""
+
+    def decode(self, text, chunk_size=3):
+        """Decode a string with a small chunk size."""
+        fp = io.BytesIO(text.encode("utf-8"))
+        return list(iter_json_array(fp, chunk_size=chunk_size))
+
+    def test_array(self):
+        """Members are decoded across chunk boundaries."""
+        doc = [{"name": "a", "n": [1, 2, 3]}, 12345, "xé", None, []]
+        for chunk_size in (1, 2, 7, 4096):
+            self.assertEqual(
+                self.decode(json.dumps(doc, indent=2), chunk_size), doc
+            )
+
+    def test_single_object(self):
+        """A document that is not an array yields one member."""
+        self.assertEqual(self.decode(' {"name": "a"} '), [{"name": "a"}])
+
+    def test_empty_array(self):
+        """An empty array yields nothing."""
+        self.assertEqual(self.decode(" [ ] "), [])
+
+    def test_byte_order_mark(self):
+        """A leading UTF-8 byte order mark is ignored."""
+        self.assertEqual(self.decode("\ufeff[1]"), [1])
+
+    def test_encodings(self):
+        """UTF-16 and UTF-32 documents are detected and decoded."""
+        doc = [{"name": "xé"}, 1]
+        text = json.dumps(doc, ensure_ascii=False)
+        for encoding in (
+            "utf-16",
+            "utf-16-le",
+            "utf-16-be",
+            "utf-32",
+            "utf-32-le",
+            "utf-32-be",
+        ):
+            with self.subTest(encoding=encoding):
+                fp = io.BytesIO(text.encode(encoding))
+                self.assertEqual(list(iter_json_array(fp, chunk_size=3)), doc)
+
+    def test_malformed(self):
+        """Malformed documents raise after yielding the valid members."""
+        for text in ("", "[1, 2", "[1 2]", "[1,]", "[1] 2", "<html>"):
+            with self.subTest(text=text):
+                found = []
+                with self.assertRaises(json.JSONDecodeError):
+                    for member in iter_json_array(
+                        io.BytesIO(text.encode("utf-8")), chunk_size=2
+                    ):
+                        found.append(member)
+                self.assertTrue(set(found) <= {1, 2})
+
+    def test_invalid_utf8(self):
+        """Undecodable bytes raise json.JSONDecodeError."""
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(io.BytesIO(b'["\xff"]')))
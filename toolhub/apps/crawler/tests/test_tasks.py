@@ -15,20 +15,40 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import datetime
+import io
+import itertools
+import json
 import os
+import threading
+from unittest import mock
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+
+import requests
 
 import requests_mock
 
+from reversion.models import Version
+
+from toolhub.apps.auditlog.models import LogEntry
 from toolhub.apps.toolinfo.models import Tool
 from toolhub.apps.user.models import ToolhubUser
 
 from .. import tasks
+from ..models import Run
+from ..models import RunUrl
 from ..models import Url
+from ..timing import TIMING_FIELDS
 
 
 @requests_mock.Mocker()
+# Make every url due again immediately so tests can crawl repeatedly
+@override_settings(CRAWLER_MIN_INTERVAL=0)
 class CrawlerTestCase(TestCase):
     """Test the crawler."""
 
@@ -206,6 +226,28 @@ class CrawlerTestCase(TestCase):
             lambda: Tool.objects.get(name="test-delete-2"),
         )
 
+    def test_delete_after_interrupted_run(self, rmock):
+        """An interrupted run is not used as the last run of a url."""
+        self.setup_url_fixture(rmock, fixture="crawler_missing_run_1.json")
+        tasks.Crawler().crawl()
+
+        with mock.patch.object(
+            tasks.Crawler,
+            "add_run_url_tools",
+            side_effect=RuntimeError("Interrupted"),
+        ):
+            with self.assertRaises(RuntimeError):
+                tasks.Crawler(crawl_all=True).crawl()
+        self.assertEqual(RunUrl.objects.filter(completed=False).count(), 1)
+
+        self.setup_url_response(rmock, fixture="crawler_missing_run_2.json")
+        run = tasks.Crawler(crawl_all=True).crawl()
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            ["test-delete-1", "test-delete-3"],
+        )
+        self.assertFalse(Tool.objects.filter(name="test-delete-2").exists())
+
     def test_revive_on_subsequent_run(self, rmock):
         """When a deleted toolinfo is found, we notice and restore the Tool."""
         # First run has 3 tools
@@ -250,3 +292,580 @@ class CrawlerTestCase(TestCase):
             self.v0_single["author"],
             Tool.objects.get(name=self.v0_single["name"]).author,
         )
+
+    def test_connection_error(self, rmock):
+        """When the remote can not be reached, we notice but don't fail."""
+        self.setup_url_fixture(rmock, exc=requests.exceptions.ConnectTimeout)
+        self.setup_url_fixture(
+            rmock, url="http://example.net", json=[self.v0_single]
+        )
+
+        crawler = tasks.Crawler()
+        run = crawler.crawl()
+
+        self.assertRunResult(run, new=1, urls=2)
+        self.assertUrlStatus(run.urls.all()[0], status_code=0, valid=False)
+        self.assertUrlStatus(run.urls.all()[1])
+
+    def test_serial_fetch(self, rmock):
+        """When limited to a single worker, all urls are still crawled."""
+        self.setup_url_fixture(rmock, json=[self.v0_single])
+        self.setup_url_fixture(
+            rmock,
+            url="http://example.net",
+            fixture="crawler_missing_run_1.json",
+        )
+
+        crawler = tasks.Crawler(max_workers=1)
+        run = crawler.crawl()
+
+        self.assertRunResult(run, new=4, urls=2)
+
+    def test_fetch_window(self, rmock):
+        """Only a bounded number of fetches run ahead of the caller."""
+        urls = [
+            self.setup_url_fixture(
+                rmock, url="http://example{}.org".format(i), json=[]
+            )
+            for i in range(6)
+        ]
+        submitted = []
+        fetched = []
+
+        class Executor(tasks.ThreadPoolExecutor):
+            def submit(self, fn, url):
+                submitted.append(url.pk)
+                return super().submit(fn, url)
+
+        release = threading.Event()
+
+        def fetch(crawler, url):
+            fetched.append(url.pk)
+            if url.pk == urls[1].pk:
+                # Keep the only worker busy so later fetches stay queued
+                release.wait(5)
+            return None, None, None
+
+        crawler = tasks.Crawler(max_workers=1)
+        with mock.patch.object(
+            tasks, "ThreadPoolExecutor", Executor
+        ), mock.patch.object(tasks.Crawler, "fetch", fetch):
+            results = crawler.fetch_urls(urls)
+            for consumed, (_url, future) in enumerate(results, start=1):
+                self.assertLessEqual(len(submitted), consumed + 2)
+                if consumed == 2:
+                    break
+                future.result()
+            threading.Timer(0.1, release.set).start()
+            results.close()
+        self.assertEqual(submitted, [url.pk for url in urls[:3]])
+        # The fetch still waiting for a worker is cancelled
+        self.assertEqual(fetched, [url.pk for url in urls[:2]])
+
+    def test_not_modified(self, rmock):
+        """When the remote has not changed, we keep the last run's tools."""
+        self.setup_url_fixture(
+            rmock,
+            fixture="crawler_missing_run_1.json",
+            headers={"ETag": '"v1"'},
+        )
+        crawler = tasks.Crawler()
+        run = crawler.crawl()
+        self.assertRunResult(run, new=3, urls=1)
+        self.assertEqual(Url.objects.get().etag, '"v1"')
+
+        rmock.register_uri(
+            "GET",
+            "http://example.org/toolinfo.json",
+            request_headers={"If-None-Match": '"v1"'},
+            status_code=304,
+        )
+        run = crawler.crawl()
+        self.assertRunResult(run, new=0, urls=1)
+        self.assertEqual(run.total_tools, 3)
+        self.assertUrlStatus(run.urls.all()[0], status_code=304)
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            ["test-delete-1", "test-delete-2", "test-delete-3"],
+        )
+
+        # A full response after a 304 still detects removed tools
+        self.setup_url_response(rmock, fixture="crawler_missing_run_2.json")
+        run = crawler.crawl()
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            ["test-delete-1", "test-delete-3"],
+        )
+        self.assertIsNone(Url.objects.get().etag)
+
+    def test_unchanged_content(self, rmock):
+        """When the content is byte-identical, we skip the upsert path."""
+        self.setup_url_fixture(rmock, fixture="crawler_missing_run_1.json")
+        crawler = tasks.Crawler()
+        crawler.crawl()
+
+        with mock.patch.object(
+            Tool.objects,
+            "bulk_from_toolinfo",
+            wraps=Tool.objects.bulk_from_toolinfo,
+        ) as bulk_from_toolinfo:
+            run = crawler.crawl()
+            bulk_from_toolinfo.assert_not_called()
+        self.assertRunResult(run, new=0, urls=1)
+        self.assertEqual(run.total_tools, 3)
+        self.assertUrlStatus(run.urls.all()[0])
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            ["test-delete-1", "test-delete-2", "test-delete-3"],
+        )
+
+    def test_unchanged_records(self, rmock):
+        """When some records are unchanged, only the others are upserted."""
+        tools = [
+            self.v0_single,
+            {
+                "name": "test-delete-1",
+                "title": "Test delete 1",
+                "description": "Test delete 1",
+                "url": "https://example.net/1",
+            },
+        ]
+        self.setup_url_fixture(rmock, json=tools)
+        crawler = tasks.Crawler()
+        crawler.crawl()
+
+        tools[0] = dict(self.v0_single, title="Changed title")
+        self.setup_url_response(rmock, json=tools)
+        with mock.patch.object(
+            Tool.objects,
+            "bulk_from_toolinfo",
+            wraps=Tool.objects.bulk_from_toolinfo,
+        ) as bulk_from_toolinfo:
+            run = crawler.crawl()
+            records = bulk_from_toolinfo.call_args[0][0]
+            self.assertEqual(len(records), 1)
+        self.assertEqual(run.updated_tools, 1)
+        self.assertEqual(run.total_tools, 2)
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            [self.v0_single["name"], "test-delete-1"],
+        )
+
+    def test_revive_unchanged_content(self, rmock):
+        """When a tool is deleted, unchanged content still restores it."""
+        self.setup_url_fixture(
+            rmock,
+            fixture="crawler_missing_run_1.json",
+            headers={"ETag": '"v1"'},
+        )
+        crawler = tasks.Crawler()
+        crawler.crawl()
+        Tool.objects.get(name="test-delete-2").delete()
+        rmock.register_uri(
+            "GET",
+            "http://example.org/toolinfo.json",
+            request_headers={"If-None-Match": '"v1"'},
+            status_code=304,
+        )
+
+        with mock.patch.object(
+            Tool.objects,
+            "bulk_from_toolinfo",
+            wraps=Tool.objects.bulk_from_toolinfo,
+        ) as bulk_from_toolinfo:
+            run = crawler.crawl()
+            # Only the deleted tool's record is upserted
+            records = bulk_from_toolinfo.call_args[0][0]
+            self.assertEqual([r["name"] for r in records], ["test-delete-2"])
+        self.assertUrlStatus(run.urls.all()[0])
+        self.assertEqual(run.total_tools, 3)
+        self.assertEqual(run.updated_tools, 1)
+        self.assertEqual(
+            Tool.objects.get(name="test-delete-2").name, "test-delete-2"
+        )
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            ["test-delete-1", "test-delete-2", "test-delete-3"],
+        )
+
+        # Once restored, unchanged content is skipped again
+        run = crawler.crawl()
+        self.assertUrlStatus(run.urls.all()[0], status_code=304)
+        self.assertEqual(run.total_tools, 3)
+
+    def test_revive_unchanged_record(self, rmock):
+        """When a tool is deleted, its unchanged record still restores it."""
+        tools = [
+            self.v0_single,
+            {
+                "name": "test-delete-1",
+                "title": "Test delete 1",
+                "description": "Test delete 1",
+                "url": "https://example.net/1",
+            },
+        ]
+        self.setup_url_fixture(rmock, json=tools)
+        crawler = tasks.Crawler()
+        crawler.crawl()
+        Tool.objects.get(name="test-delete-1").delete()
+
+        tools[0] = dict(self.v0_single, title="Changed title")
+        self.setup_url_response(rmock, json=tools)
+        run = crawler.crawl()
+        self.assertEqual(run.updated_tools, 2)
+        self.assertEqual(run.total_tools, 2)
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            [self.v0_single["name"], "test-delete-1"],
+        )
+
+    def test_retry_after(self, rmock):
+        """When the remote asks us to come back soon, we retry once."""
+        self.setup_url_fixture(
+            rmock,
+            response_list=[
+                {"status_code": 429, "headers": {"Retry-After": "0"}},
+                {"json": [self.v0_single]},
+            ],
+        )
+
+        crawler = tasks.Crawler()
+        run = crawler.crawl()
+
+        self.assertRunResult(run, new=1, urls=1)
+        self.assertUrlStatus(run.urls.all()[0])
+
+    @override_settings(CRAWLER_MIN_INTERVAL=60, CRAWLER_MAX_INTERVAL=600)
+    def test_schedule(self, rmock):
+        """Urls are only crawled when due and back off on failure."""
+        url = self.setup_url_fixture(rmock, json=[self.v0_single])
+        crawler = tasks.Crawler()
+
+        run = crawler.crawl()
+        self.assertRunResult(run, new=1, urls=1)
+        url.refresh_from_db()
+        self.assertEqual(url.crawl_interval, 60)
+        self.assertEqual(url.consecutive_failures, 0)
+        self.assertGreater(url.next_crawl_date, timezone.now())
+
+        # Not due yet
+        run = crawler.crawl()
+        self.assertRunResult(run, new=0, urls=0)
+
+        # Unchanged content doubles the interval
+        run = tasks.Crawler(crawl_all=True).crawl()
+        self.assertRunResult(run, new=0, urls=1)
+        url.refresh_from_db()
+        self.assertEqual(url.crawl_interval, 120)
+
+        # Failures back off without changing the interval
+        self.setup_url_response(rmock, status_code=500)
+        tasks.Crawler(crawl_all=True).crawl()
+        tasks.Crawler(crawl_all=True).crawl()
+        url.refresh_from_db()
+        self.assertEqual(url.crawl_interval, 120)
+        self.assertEqual(url.consecutive_failures, 2)
+        self.assertGreater(
+            url.next_crawl_date,
+            timezone.now() + datetime.timedelta(seconds=400),
+        )
+
+    def test_toolinfo_in_last_run(self, rmock):
+        """Tools from each url's most recent run are found in one query."""
+        u1 = self.setup_url_fixture(
+            rmock, fixture="crawler_missing_run_1.json"
+        )
+        u2 = self.setup_url_fixture(
+            rmock, url="http://example.net", json=[self.v0_single]
+        )
+        crawler = tasks.Crawler()
+        crawler.crawl()
+        self.setup_url_response(rmock, fixture="crawler_missing_run_2.json")
+        crawler.crawl()
+
+        with self.assertNumQueries(1):
+            found = crawler.toolinfo_in_last_run([u1, u2])
+        self.assertEqual(set(found[u1.pk]), {"test-delete-1", "test-delete-3"})
+        self.assertEqual(set(found[u2.pk]), {self.v0_single["name"]})
+        self.assertEqual(crawler.toolinfo_in_last_run([]), {})
+
+        self.assertEqual(crawler.urls_with_deleted_tools([u1, u2]), set())
+        Tool.objects.get(name=self.v0_single["name"]).delete()
+        self.assertEqual(crawler.urls_with_deleted_tools([u1, u2]), {u2.pk})
+
+    def test_response_too_large(self, rmock):
+        """When the response is too large, we keep the last run's tools."""
+        self.setup_url_fixture(rmock, json=[self.v0_single])
+        crawler = tasks.Crawler()
+        run = crawler.crawl()
+        self.assertRunResult(run, new=1, urls=1)
+
+        self.setup_url_response(rmock, json=[self.v0_single, self.v0_single])
+        with override_settings(CRAWLER_MAX_RESPONSE_SIZE=64):
+            run = crawler.crawl()
+        self.assertRunResult(run, new=0, urls=1)
+        self.assertUrlStatus(run.urls.all()[0], status_code=0, valid=False)
+        self.assertEqual(Tool.objects.count(), 1)
+
+    def test_truncated_json(self, rmock):
+        """When the response is cut short, unread tools are kept."""
+        self.setup_url_fixture(rmock, fixture="crawler_missing_run_1.json")
+        crawler = tasks.Crawler()
+        crawler.crawl()
+
+        fpath = os.path.join(self.work_dir, "crawler_missing_run_1.json")
+        with open(fpath, "r") as f:
+            text = f.read()
+        # Cut the document off part way through the second record
+        cut = text.index('"test-delete-2"') + 20
+        self.setup_url_response(rmock, text=text[:cut])
+        run = crawler.crawl()
+        self.assertRunResult(run, new=0, urls=1)
+        self.assertUrlStatus(run.urls.all()[0], valid=False)
+        self.assertToolsInUrl(
+            run.urls.all()[0],
+            ["test-delete-1", "test-delete-2", "test-delete-3"],
+        )
+        self.assertEqual(Tool.objects.count(), 3)
+
+    @override_settings(CRAWLER_CONNECT_TIMEOUT=2, CRAWLER_READ_TIMEOUT=7)
+    def test_session(self, rmock):
+        """Requests share a session with our user agent and timeouts."""
+        self.setup_url_fixture(rmock, json=[self.v0_single])
+        self.setup_url_fixture(
+            rmock, url="http://example.org/other.json", json=[]
+        )
+        crawler = tasks.Crawler()
+        with mock.patch.object(
+            crawler, "make_session", wraps=crawler.make_session
+        ) as make_session:
+            crawler.crawl()
+        make_session.assert_called_once_with()
+
+        self.assertEqual(len(rmock.request_history), 2)
+        for req in rmock.request_history:
+            self.assertEqual(req.headers["user-agent"], crawler.user_agent)
+            self.assertIn("gzip", req.headers["accept-encoding"])
+            self.assertEqual(req.timeout, (2, 7))
+
+    def test_shards(self, rmock):
+        """Shards crawl disjoint urls and share a single run."""
+        self.setup_url_fixture(rmock, json=[self.v0_single])
+        self.setup_url_fixture(
+            rmock,
+            url="http://example.net",
+            fixture="crawler_missing_run_1.json",
+        )
+
+        shards = [
+            tasks.Crawler(shard=(i, 2), run_key="test") for i in range(2)
+        ]
+        run = shards[0].crawl()
+        self.assertIsNone(run.end_date)
+        self.assertEqual(run.urls.count(), 1)
+
+        # Finishing a shard again does not count it twice
+        tasks.Crawler(shard=(0, 2), run_key="test").finish_run(run)
+        self.assertIsNone(run.end_date)
+        self.assertEqual(run.shards_done, 1)
+
+        run = shards[1].crawl()
+        self.assertIsNotNone(run.end_date)
+        self.assertEqual(run.shards_done, 2)
+        self.assertRunResult(run, new=4, urls=2)
+        self.assertEqual(run.total_tools, 4)
+
+        # A finished run can not be joined again
+        with self.assertRaises(ValueError):
+            tasks.Crawler(shard=(0, 2), run_key="test").crawl()
+        with self.assertRaises(ValueError):
+            tasks.Crawler(shard=(2, 2))
+
+    def test_shard_requires_run_key(self, rmock):
+        """Shards of a crawl must share a run key."""
+        with self.assertRaises(ValueError):
+            tasks.Crawler(shard=(0, 2))
+        with self.assertRaises(CommandError):
+            call_command("crawl", shard=(0, 2), stdout=io.StringIO())
+        self.assertFalse(Run.objects.exists())
+        # A single shard and dry runs do not need a shared run
+        tasks.Crawler(shard=(0, 1))
+        tasks.DryRunCrawler(shard=(0, 2))
+
+    def test_resume(self, rmock):
+        """An interrupted run continues from its last completed url."""
+        self.setup_url_fixture(
+            rmock,
+            url="http://example.net",
+            fixture="crawler_missing_run_1.json",
+        )
+        self.setup_url_fixture(rmock, json=[self.v0_single])
+        process_url = tasks.Crawler.process_url
+
+        def interrupt(crawler, run_url, seen, response):
+            process_url(crawler, run_url, seen, response)
+            if run_url.url.url == "http://example.org/toolinfo.json":
+                raise RuntimeError("Interrupted")
+
+        with mock.patch.object(tasks.Crawler, "process_url", interrupt):
+            with self.assertRaises(RuntimeError):
+                tasks.Crawler(crawl_all=True).crawl()
+        run = Run.objects.get()
+        self.assertIsNone(run.end_date)
+        self.assertEqual(run.total_tools, 3)
+        self.assertEqual(run.urls.filter(completed=False).count(), 1)
+
+        crawled = []
+
+        def record(crawler, run_url, seen, response):
+            crawled.append(run_url.url.url)
+            process_url(crawler, run_url, seen, response)
+
+        with mock.patch.object(tasks.Crawler, "process_url", record):
+            run = tasks.Crawler(crawl_all=True, resume=True).crawl()
+        self.assertEqual(crawled, ["http://example.org/toolinfo.json"])
+        self.assertEqual(Run.objects.count(), 1)
+        self.assertIsNotNone(run.end_date)
+        self.assertEqual(run.total_tools, 4)
+        self.assertEqual(run.urls.count(), 2)
+        self.assertEqual(run.urls.filter(completed=True).count(), 2)
+
+        # Nothing to resume
+        run = tasks.Crawler(resume=True).crawl()
+        self.assertEqual(Run.objects.count(), 2)
+
+    def test_invalid_schema(self, rmock):
+        """Records are validated against the schema they name."""
+        valid = dict(self.v0_single, name="valid")
+        invalid = dict(
+            valid,
+            name="invalid",
+            tool_type="not a tool type",
+            for_wikis=["example.org"],
+        )
+        invalid["$schema"] = "/toolinfo/1.2.0-draft02"
+        self.setup_url_fixture(rmock, json=[valid, invalid, "junk"])
+
+        with mock.patch.object(
+            Tool.objects,
+            "bulk_from_toolinfo",
+            wraps=Tool.objects.bulk_from_toolinfo,
+        ) as bulk:
+            run = tasks.Crawler().crawl()
+        self.assertRunResult(run, new=1, urls=1)
+        run_url = run.urls.all()[0]
+        self.assertUrlStatus(run_url, valid=False)
+        names = [r["name"] for r in bulk.call_args[0][0]]
+        self.assertEqual(names, ["valid"])
+        self.assertIn("schema 1.2.0 at /tool_type", run_url.logs)
+        self.assertIn("schema 1.2.0 at /for_wikis", run_url.logs)
+        self.assertIn("not an object", run_url.logs)
+
+    def test_invalid_record_keeps_tool(self, rmock):
+        """A tool whose record becomes invalid is not deleted."""
+        self.setup_url_fixture(rmock, json=[self.v0_single])
+        tasks.Crawler().crawl()
+
+        self.setup_url_response(
+            rmock, json=[dict(self.v0_single, subtitle=None)]
+        )
+        run = tasks.Crawler(crawl_all=True).crawl()
+        run_url = run.urls.get()
+        self.assertUrlStatus(run_url, valid=False)
+        self.assertIn("schema", run_url.logs)
+        self.assertTrue(
+            Tool.objects.filter(name=self.v0_single["name"]).exists()
+        )
+        self.assertToolsInUrl(run_url, [self.v0_single["name"]])
+        self.assertEqual(run.total_tools, 1)
+
+    def test_invalid_toolforge_record_keeps_tool(self, rmock):
+        """Invalid records are matched to tools by normalized name."""
+        record = dict(self.v0_single, name="toolforge.foo")
+        self.setup_url_fixture(rmock, json=[record])
+        tasks.Crawler().crawl()
+        self.assertTrue(Tool.objects.filter(name="toolforge-foo").exists())
+
+        self.setup_url_response(rmock, json=[dict(record, subtitle=None)])
+        run = tasks.Crawler(crawl_all=True).crawl()
+        self.assertUrlStatus(run.urls.get(), valid=False)
+        self.assertTrue(Tool.objects.filter(name="toolforge-foo").exists())
+        self.assertToolsInUrl(run.urls.get(), ["toolforge-foo"])
+
+    def test_dry_run(self, rmock):
+        """A dry run reports changes without writing anything."""
+        self.setup_url_fixture(rmock, fixture="crawler_missing_run_1.json")
+        tasks.Crawler().crawl()
+
+        fpath = os.path.join(self.work_dir, "crawler_missing_run_2.json")
+        with open(fpath, "r") as f:
+            records = json.load(f)
+        records[0]["title"] = "Changed title"
+        records.append(self.v0_single)
+        self.setup_url_response(rmock, json=records)
+
+        counts = (
+            Run.objects.count(),
+            RunUrl.objects.count(),
+            Version.objects.count(),
+            LogEntry.objects.count(),
+        )
+        crawler = tasks.DryRunCrawler()
+        run = crawler.crawl()
+        self.assertIsNone(run.pk)
+        self.assertEqual(run.new_tools, 1)
+        self.assertEqual(run.updated_tools, 1)
+        self.assertEqual(
+            crawler.report,
+            [
+                {
+                    "url": "http://example.org/toolinfo.json",
+                    "status_code": 200,
+                    "valid": True,
+                    "create": [self.v0_single["name"]],
+                    "update": {
+                        "test-delete-1": {
+                            "title": ("Test delete 1", "Changed title")
+                        }
+                    },
+                    "delete": ["test-delete-2"],
+                    "reject": [],
+                }
+            ],
+        )
+        self.assertEqual(
+            counts,
+            (
+                Run.objects.count(),
+                RunUrl.objects.count(),
+                Version.objects.count(),
+                LogEntry.objects.count(),
+            ),
+        )
+        self.assertEqual(Tool.objects.count(), 3)
+        self.assertEqual(
+            Tool.objects.get(name="test-delete-1").title, "Test delete 1"
+        )
+
+        out = io.StringIO()
+        call_command("crawl", dry_run=True, stdout=out)
+        self.assertIn("delete test-delete-2", out.getvalue())
+        self.assertIn(
+            "title: 'Test delete 1' -> 'Changed title'", out.getvalue()
+        )
+
+    def test_timings(self, rmock):
+        """Phase timings are recorded for each url and summed for the run."""
+        self.setup_url_fixture(rmock, fixture="crawler_missing_run_1.json")
+        # Each request appears to take 1.5 seconds
+        clock = mock.patch(
+            "requests.sessions.preferred_clock",
+            side_effect=itertools.count(step=1.5),
+        )
+        with clock:
+            run = tasks.Crawler().crawl()
+        run_url = run.urls.get()
+        self.assertEqual(run_url.elapsed_ms, 1500)
+        self.assertEqual(run.elapsed_ms, 1500)
+        for field in TIMING_FIELDS:
+            self.assertEqual(getattr(run, field), getattr(run_url, field))
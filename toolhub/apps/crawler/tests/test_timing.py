@@ -0,0 +1,54 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import types
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..timing import PhaseTimer
+
+
+class PhaseTimerTest(SimpleTestCase):
+    """Test PhaseTimer."""
+
+    @mock.patch("time.perf_counter", side_effect=[0, 0.25, 1, 1.5, 2, 2.5])
+    def test_phases(self, perf_counter):
+        """Time spent in each phase is accumulated."""
+        timer = PhaseTimer()
+        with timer("db"):
+            pass
+        items = list(timer.iterate("parse", ["a"]))
+        self.assertEqual(items, ["a"])
+        timer.add("elapsed", 1.2345)
+
+        other = PhaseTimer()
+        other.add("wait", 0.002)
+        timer.merge(other)
+
+        self.assertEqual(timer.ms("db"), 250)
+        # Two calls to next(): one item and StopIteration
+        self.assertEqual(timer.ms("parse"), 1000)
+        self.assertEqual(timer.ms("elapsed"), 1234)
+        self.assertEqual(timer.ms("wait"), 2)
+        self.assertEqual(timer.ms("validate"), 0)
+
+        obj = types.SimpleNamespace()
+        timer.record(obj)
+        self.assertEqual(obj.db_ms, 250)
+        self.assertEqual(obj.elapsed_ms, 1234)
+        self.assertEqual(obj.download_ms, 0)
@@ -0,0 +1,84 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import collections
+import contextlib
+import time
+
+
+# Phases of crawling a URL that are recorded as <phase>_ms on RunUrl and Run
+PHASES = (
+    # Waiting for the per-host rate limiter
+    "wait",
+    # Sending the request until response headers arrived
+    "elapsed",
+    # Reading the response body
+    "download",
+    # Decoding JSON
+    "parse",
+    # Validating records
+    "validate",
+    # Writing tools and related rows to the database
+    "db",
+)
+TIMING_FIELDS = tuple("{}_ms".format(phase) for phase in PHASES)
+
+
+class PhaseTimer:
+    """Accumulate the wall clock time spent in named phases of work."""
+
+    def __init__(self):
+        """Initialize a new instance."""
+        self.seconds = collections.defaultdict(float)
+
+    @contextlib.contextmanager
+    def __call__(self, phase):
+        """Time the body of a with statement."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[phase] += time.perf_counter() - start
+
+    def add(self, phase, seconds):
+        """Add time measured elsewhere to a phase."""
+        self.seconds[phase] += seconds
+
+    def merge(self, other):
+        """Add all phases of another PhaseTimer."""
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] += seconds
+
+    def iterate(self, phase, iterable):
+        """Wrap an iterable, timing the production of each item."""
+        iterator = iter(iterable)
+        while True:
+            with self(phase):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def ms(self, phase):
+        """Get the total for a phase in whole milliseconds."""
+        return int(round(self.seconds[phase] * 1000))
+
+    def record(self, obj):
+        """Set the <phase>_ms attributes of a model instance."""
+        for phase, field in zip(PHASES, TIMING_FIELDS):
+            setattr(obj, field, self.ms(phase))
@@ -22,5 +22,10 @@ from django.utils.translation import gettext_lazy as _
 class SearchConfig(AppConfig):
     """Metadata class for app."""
 
-    name = "search"
+    name = "toolhub.apps.search"
+    label = "search"
     verbose_name = _("Search")
+
+    def ready(self):
+        """Register system checks."""
+        from . import checks  # noqa: F401
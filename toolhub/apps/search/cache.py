@@ -0,0 +1,64 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+
+
+GENERATION_KEY = "search:generation"
+
+
+def get_generation():
+    """Get the current search index generation."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock rather than 1 so that a lost counter does
+        # not reuse the generation of entries that may still be cached.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """Invalidate cached search results after the index was written to."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def normalize_params(query_params):
+    """Get a canonical form of query parameters.
+
+    :param query_params: QueryDict of request parameters
+    :returns: list of (name, sorted values) tuples sorted by name
+    """
+    return [
+        (name, sorted(query_params.getlist(name)))
+        for name in sorted(query_params)
+    ]
+
+
+def make_key(kind, *parts):
+    """Build a cache key for the current generation."""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return "search:{}:{}:{}".format(kind, get_generation(), digest)
@@ -0,0 +1,36 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from django.conf import settings
+from django.core.checks import Error
+from django.core.checks import register
+
+
+@register()
+def check_search_profile(app_configs, **kwargs):  # noqa: W0613
+    """Ensure settings.SEARCH_PROFILE names a known search profile."""
+    from .views import SEARCH_PROFILES
+
+    if settings.SEARCH_PROFILE in SEARCH_PROFILES:
+        return []
+    return [
+        Error(
+            "Unknown SEARCH_PROFILE {!r}".format(settings.SEARCH_PROFILE),
+            hint="Use one of: {}".format(", ".join(sorted(SEARCH_PROFILES))),
+            id="search.E001",
+        )
+    ]
@@ -0,0 +1,346 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import re
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from django_elasticsearch_dsl_drf import constants
+
+from elasticsearch_dsl.utils import AttrDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
+
+from .documents import ToolDocument
+from .models import ToolSearchIndex
+from .models import ToolSearchTerm
+
+
+# Words of a simple_query_string query, optionally negated with "-"
+QUERY_TERM_RE = re.compile(r"(-?)([\w.']+)", re.UNICODE)
+
+# Default InnoDB FULLTEXT stopwords, which never match
+FULLTEXT_STOPWORDS = frozenset(
+    (
+        "a about an are as at be by com de en for from how i in is it la of "
+        "on or that the this to was what when where who will with und www"
+    ).split()
+)
+
+# Ordering fields of ToolDocumentViewSet mapped to ToolSearchIndex lookups
+ORDERING_FIELDS = {
+    "_score": "score",
+    "name.keyword": "tool__name",
+    "title.keyword": "tool__title",
+    "created_date": "tool__created_date",
+    "modified_date": "tool__modified_date",
+}
+
+
+def document_field(field):
+    """Get the document field of an Elasticsearch field path."""
+    suffix = ".keyword"
+    if field.endswith(suffix):
+        end = len(field) - len(suffix)
+        return field[:end]
+    return field
+
+
+class DatabaseSearch:
+    """Tool search backed by the ToolSearchIndex tables.
+
+    Answers the same `q`, filter, facet, ordering and paging parameters
+    as ``ToolDocumentViewSet`` with responses in the same shape, so
+    search keeps working without Elasticsearch. Full text matching uses a
+    FULLTEXT index on MySQL and substring matching elsewhere. Words the
+    FULLTEXT index does not hold, because they are stopwords or shorter
+    than ``FULLTEXT_MIN_LENGTH``, are matched as substrings. Quoted
+    phrases and other simple_query_string operators are reduced to their
+    words, and the `cursor` paging parameter is ignored.
+    """
+
+    # Size of facet terms aggregations in Elasticsearch
+    FACET_SIZE = 10
+    # Shortest indexed word with MySQL's default ft_min_word_len
+    FULLTEXT_MIN_LENGTH = 4
+
+    def __init__(self, view, request):
+        """Initialize a new instance."""
+        self.view = view
+        self.request = request
+        self.fulltext = connection.vendor == "mysql"
+
+    def parse_query(self, query):
+        """Split a search query into required and excluded words."""
+        include = []
+        exclude = []
+        for negate, word in QUERY_TERM_RE.findall(query or ""):
+            (exclude if negate else include).append(word)
+        return include, exclude
+
+    def is_indexed(self, word):
+        """Determine if a word can be matched with the FULLTEXT index."""
+        return (
+            len(word) >= self.FULLTEXT_MIN_LENGTH
+            and word.lower() not in FULLTEXT_STOPWORDS
+        )
+
+    def search_queryset(self, qs):
+        """Restrict a queryset to Tools matching the `q` parameter."""
+        include, exclude = self.parse_query(
+            self.request.query_params.get("q", "")
+        )
+        if not include and not exclude:
+            return qs
+        if self.fulltext:
+            terms = [
+                "+{}*".format(word)
+                for word in include
+                if self.is_indexed(word)
+            ]
+            terms.extend(
+                "-{}".format(word) for word in exclude if self.is_indexed(word)
+            )
+            include = [word for word in include if not self.is_indexed(word)]
+            exclude = [word for word in exclude if not self.is_indexed(word)]
+            if terms:
+                match = RawSQL(
+                    "MATCH ({}.text) AGAINST (%s IN BOOLEAN MODE)".format(
+                        ToolSearchIndex._meta.db_table  # noqa: W0212
+                    ),
+                    [" ".join(terms)],
+                    output_field=FloatField(),
+                )
+                qs = qs.annotate(score=match).filter(score__gt=0)
+        for word in include:
+            qs = qs.filter(text__icontains=word)
+        for word in exclude:
+            qs = qs.exclude(text__icontains=word)
+        return qs
+
+    def filter_queryset(self, qs):
+        """Apply filter parameters of the view."""
+        fields = self.view.filter_fields
+        for param in self.request.query_params:
+            name, _, lookup = param.partition(
+                constants.SEPARATOR_LOOKUP_FILTER
+            )
+            if name not in fields:
+                continue
+            lookup = lookup or constants.LOOKUP_FILTER_TERM
+            if lookup not in fields[name]["lookups"]:
+                continue
+            field = document_field(fields[name]["field"])
+            for value in self.request.query_params.getlist(param):
+                qs = self.apply_filter(qs, field, lookup, value)
+        return qs
+
+    # String lookups mapped to ToolSearchTerm value lookups
+    VALUE_LOOKUPS = {
+        constants.LOOKUP_FILTER_TERM: "value",
+        constants.LOOKUP_FILTER_PREFIX: "value__startswith",
+        constants.LOOKUP_QUERY_STARTSWITH: "value__startswith",
+        constants.LOOKUP_QUERY_ENDSWITH: "value__endswith",
+        constants.LOOKUP_QUERY_CONTAINS: "value__contains",
+    }
+
+    def apply_filter(self, qs, field, lookup, value):
+        """Apply a single filter lookup.
+
+        Lookups which need an analyzed field, like `wildcard`, are
+        ignored.
+        """
+        terms = ToolSearchTerm.objects.filter(field=field)
+        if lookup == constants.LOOKUP_QUERY_ISNULL:
+            has_value = terms.values("tool_id")
+            if value.lower() in ("true", "1", "yes"):
+                return qs.exclude(tool_id__in=has_value)
+            return qs.filter(tool_id__in=has_value)
+        if lookup in (
+            constants.LOOKUP_FILTER_TERMS,
+            constants.LOOKUP_QUERY_IN,
+            constants.LOOKUP_QUERY_EXCLUDE,
+        ):
+            values = value.split(constants.SEPARATOR_LOOKUP_COMPLEX_VALUE)
+            matches = terms.filter(value__in=values).values("tool_id")
+            if lookup == constants.LOOKUP_QUERY_EXCLUDE:
+                return qs.exclude(tool_id__in=matches)
+            return qs.filter(tool_id__in=matches)
+        if lookup in self.VALUE_LOOKUPS:
+            matches = terms.filter(**{self.VALUE_LOOKUPS[lookup]: value})
+            return qs.filter(tool_id__in=matches.values("tool_id"))
+        return qs
+
+    def order_queryset(self, qs):
+        """Apply the `ordering` parameter or the default ordering."""
+        ordering = []
+        for param in self.request.query_params.getlist("ordering"):
+            for name in param.split(","):
+                prefix = "-" if name.startswith("-") else ""
+                field = self.view.ordering_fields.get(name.lstrip("-"))
+                if field:
+                    ordering.append(prefix + field)
+        if not ordering:
+            ordering = list(self.view.ordering)
+
+        order_by = []
+        for field in ordering:
+            prefix = "-" if field.startswith("-") else ""
+            lookup = ORDERING_FIELDS.get(field.lstrip("-"))
+            if lookup == "score":
+                if "score" not in qs.query.annotations:
+                    continue
+                # Relevance is highest first like Elasticsearch's _score
+                prefix = "" if prefix else "-"
+            if lookup:
+                order_by.append(prefix + lookup)
+        if "tool__name" not in order_by:
+            order_by.append("tool__name")
+        return qs.order_by(*order_by)
+
+    def facets(self, qs):
+        """Count facet terms of the matching Tools.
+
+        Buckets follow Elasticsearch terms aggregations: the most frequent
+        terms first with documents missing the field counted as the
+        facet's missing value.
+        """
+        total = qs.count()
+        tool_ids = qs.values("tool_id")
+        result = OrderedDict()
+        for name, facet in self.view.faceted_search_fields.items():
+            if not facet.get("enabled", False):
+                continue
+            options = facet.get("options", {})
+            field = document_field(facet["field"])
+            counts = (
+                ToolSearchTerm.objects.filter(
+                    field=field, tool_id__in=tool_ids
+                )
+                .values("value")
+                .annotate(doc_count=Count("tool_id", distinct=True))
+                .values_list("value", "doc_count")
+            )
+            buckets = [
+                {"key": key, "doc_count": count} for key, count in counts
+            ]
+            if "missing" in options:
+                missing = total - (
+                    ToolSearchTerm.objects.filter(
+                        field=field, tool_id__in=tool_ids
+                    )
+                    .values("tool_id")
+                    .distinct()
+                    .count()
+                )
+                if missing:
+                    buckets.append(
+                        {"key": options["missing"], "doc_count": missing}
+                    )
+            buckets.sort(key=lambda b: (-b["doc_count"], b["key"]))
+            size = self.FACET_SIZE
+            result["_filter_" + name] = {
+                "doc_count": total,
+                name: {
+                    "meta": options.get("meta", {}),
+                    "doc_count_error_upper_bound": 0,
+                    "sum_other_doc_count": sum(
+                        b["doc_count"] for b in buckets[size:]
+                    ),
+                    "buckets": buckets[:size],
+                },
+            }
+        return result
+
+    def get_page(self, qs):
+        """Get the requested page of results.
+
+        :raises NotFound: if the page does not exist
+        """
+        paginator = self.view.paginator
+        page_size = paginator.get_page_size(self.request)
+        page_number = self.request.query_params.get(
+            paginator.page_query_param, 1
+        )
+        try:
+            return Paginator(qs, page_size).page(page_number)
+        except InvalidPage as e:
+            raise NotFound(
+                paginator.invalid_page_message.format(
+                    page_number=page_number, message=str(e)
+                )
+            )
+
+    def page_link(self, number):
+        """Get the link to a page of results.
+
+        Cursors are not supported, so links always use page numbers.
+        """
+        paginator = self.view.paginator
+        url = remove_query_param(
+            self.request.build_absolute_uri(), paginator.cursor_query_param
+        )
+        param = paginator.page_query_param
+        if number == 1:
+            return remove_query_param(url, param)
+        return replace_query_param(url, param, number)
+
+    def results(self, page):
+        """Serialize a page of Tools like Elasticsearch hits."""
+        doc = ToolDocument()
+        hits = [AttrDict(doc.prepare(row.tool)) for row in page]
+        return self.view.get_serializer(hits, many=True).data
+
+    def search(self):
+        """Run the search.
+
+        :returns: response data
+        :rtype: OrderedDict
+        """
+        qs = ToolSearchIndex.objects.select_related(
+            "tool", "tool__created_by"
+        ).filter(tool__deleted__isnull=True)
+        qs = self.filter_queryset(self.search_queryset(qs))
+        facets = self.facets(qs)
+        page = self.get_page(self.order_queryset(qs))
+        return OrderedDict(
+            [
+                ("count", page.paginator.count),
+                (
+                    "next",
+                    self.page_link(page.next_page_number())
+                    if page.has_next()
+                    else None,
+                ),
+                (
+                    "previous",
+                    self.page_link(page.previous_page_number())
+                    if page.has_previous()
+                    else None,
+                ),
+                ("facets", facets),
+                ("results", self.results(page)),
+            ]
+        )
@@ -118,6 +118,8 @@ class ToolDocument(SearchDocument):
         }
     )
     set_override(created_by, "field", schema.USER)
+    # Tool names and titles for search-as-you-type suggestions
+    suggest = fields.CompletionField()
 
     class Index:
         """Configure index."""
@@ -165,3 +167,11 @@ class ToolDocument(SearchDocument):
             # "modified_by",
             "modified_date",
         ]
+
+    def get_queryset(self):
+        """Get the Tools to index."""
+        return super().get_queryset().select_related("created_by")
+
+    def prepare_suggest(self, instance):
+        """Get autocomplete inputs for a Tool."""
+        return {"input": [instance.name, instance.title]}
@@ -0,0 +1,252 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F
+
+from django_elasticsearch_dsl.registries import registry
+
+from elasticsearch.exceptions import ElasticsearchException
+
+from . import cache
+from .models import IndexQueue
+
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+def _get_state():
+    """Get the pending updates of the current thread."""
+    if not hasattr(_state, "pending"):
+        _state.pending = {}
+        _state.depth = 0
+    return _state
+
+
+def add(model, pks):
+    """Schedule search index updates for model instances.
+
+    Updates are sent when the current transaction commits, or
+    immediately in autocommit mode, with a single attempt so that web
+    requests do not wait on Elasticsearch retries. Inside `deferred()`
+    they are held until the outermost block exits or
+    `SEARCH_INDEX_BATCH_SIZE` updates are pending and failed requests are
+    retried. The index or delete action for each object is decided from
+    the database when the updates are sent.
+    """
+    state = _get_state()
+    state.pending.setdefault(model, set()).update(pks)
+    pending = sum(len(model_pks) for model_pks in state.pending.values())
+    # A flush sends everything pending, so later callbacks registered
+    # in the same transaction find nothing left to do.
+    if not state.depth:
+        transaction.on_commit(flush_once)
+    elif pending >= settings.SEARCH_INDEX_BATCH_SIZE:
+        transaction.on_commit(flush)
+
+
+@contextlib.contextmanager
+def deferred():
+    """Collect search index updates and send them in batches."""
+    state = _get_state()
+    state.depth += 1
+    try:
+        yield
+    finally:
+        state.depth -= 1
+        if not state.depth and state.pending:
+            transaction.on_commit(flush)
+
+
+def flush(retries=None):
+    """Send all pending search index updates of the current thread.
+
+    Updates which still fail after retrying are saved in the IndexQueue
+    table for `process_queue` to send later.
+
+    :param retries: Number of times to retry a failed request. Defaults
+        to `SEARCH_INDEX_MAX_RETRIES`.
+    """
+    state = _get_state()
+    pending, state.pending = state.pending, {}
+    for model, pks in pending.items():
+        failed = set()
+        for doc in registry.get_documents([model]):
+            if not doc.django.ignore_signals:
+                failed |= index_objects(doc, pks, retries)
+        if failed:
+            enqueue(model, failed)
+
+
+def flush_once():
+    """Send all pending search index updates without retrying.
+
+    Failed updates are queued for `process_queue` straight away.
+    """
+    flush(retries=0)
+
+
+def index_objects(doc, pks, retries=None):
+    """Index or delete objects with a single bulk request.
+
+    Objects missing from the document's queryset are deleted from the
+    index. The request is retried with exponential backoff.
+
+    :param doc: Document class to update
+    :param pks: Primary keys of objects to update
+    :param retries: Number of times to retry a failed request. Defaults
+        to `SEARCH_INDEX_MAX_RETRIES`.
+    :returns: set of primary keys which could not be updated
+    """
+    if retries is None:
+        retries = settings.SEARCH_INDEX_MAX_RETRIES
+    instance = doc()
+    model = doc.django.model
+    found = {obj.pk: obj for obj in instance.get_queryset().filter(pk__in=pks)}
+    actions = {}
+    for pk in pks:
+        if pk in found:
+            action = instance._prepare_action(found[pk], "index")
+        else:
+            action = instance._prepare_action(model(pk=pk), "delete")
+        actions[str(pk)] = action
+
+    kwargs = {"raise_on_error": False}
+    if doc.django.auto_refresh:
+        kwargs["refresh"] = True
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(settings.SEARCH_INDEX_RETRY_DELAY * 2 ** (attempt - 1))
+        try:
+            _, errors = instance.bulk(list(actions.values()), **kwargs)
+        except ElasticsearchException:
+            logger.warning(
+                "Bulk update of %d %s documents failed (attempt %d)",
+                len(actions),
+                doc.__name__,
+                attempt + 1,
+                exc_info=True,
+            )
+            continue
+        cache.bump_generation()
+        failed = {}
+        for error in errors:
+            for op_type, item in error.items():
+                if op_type == "delete" and item.get("status") == 404:
+                    # Already absent from the index
+                    continue
+                failed[item["_id"]] = actions[item["_id"]]
+        actions = failed
+        if not actions:
+            break
+        logger.warning(
+            "Failed to update %s documents %s (attempt %d)",
+            doc.__name__,
+            sorted(actions),
+            attempt + 1,
+        )
+    return {pk for pk in pks if str(pk) in actions}
+
+
+def catch_up(doc, since=None, chunk_size=None):
+    """Send index updates for objects modified since a point in time.
+
+    Objects missing from the document's queryset, such as soft deleted
+    Tools, are deleted from the index. Failed updates are queued.
+
+    :param doc: Document class to update
+    :param since: Only update objects modified at or after this time
+    :param chunk_size: Number of objects to send per request
+    :returns: (updated (int), failed (int))
+    :rtype: tuple
+    """
+    chunk_size = chunk_size or settings.SEARCH_INDEX_BATCH_SIZE
+    model = doc.django.model
+    pks = model._base_manager.order_by("pk")
+    if since is not None:
+        pks = pks.filter(modified_date__gte=since)
+    pks = pks.values_list("pk", flat=True).iterator(chunk_size=chunk_size)
+    updated = failed = 0
+    while True:
+        chunk = set(itertools.islice(pks, chunk_size))
+        if not chunk:
+            break
+        errors = index_objects(doc, chunk)
+        if errors:
+            enqueue(model, errors)
+        updated += len(chunk) - len(errors)
+        failed += len(errors)
+    return updated, failed
+
+
+def enqueue(model, pks):
+    """Save failed index updates for a later retry."""
+    logger.error("Queueing index updates of %s %s", model.__name__, pks)
+    content_type = ContentType.objects.get_for_model(model)
+    IndexQueue.objects.bulk_create(
+        [IndexQueue(content_type=content_type, object_id=pk) for pk in pks],
+        ignore_conflicts=True,
+    )
+
+
+def process_queue(batch_size=None):
+    """Retry queued index updates.
+
+    :param batch_size: Number of queued objects to send per request
+    :returns: (updated (int), failed (int))
+    :rtype: tuple
+    """
+    batch_size = batch_size or settings.SEARCH_INDEX_BATCH_SIZE
+    updated = failed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            IndexQueue.objects.filter(id__gt=last_id)
+            .select_related("content_type")
+            .order_by("id")[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        by_model = {}
+        for item in batch:
+            model = item.content_type.model_class()
+            by_model.setdefault(model, []).append(item)
+        for model, items in by_model.items():
+            pks = {item.object_id for item in items}
+            errors = set()
+            for doc in registry.get_documents([model]):
+                if not doc.django.ignore_signals:
+                    errors |= index_objects(doc, pks)
+            done = [item.id for item in items if item.object_id not in errors]
+            IndexQueue.objects.filter(id__in=done).delete()
+            IndexQueue.objects.filter(
+                id__in=[item.id for item in items if item.id not in done]
+            ).update(attempts=F("attempts") + 1)
+            updated += len(done)
+            failed += len(items) - len(done)
+    return updated, failed
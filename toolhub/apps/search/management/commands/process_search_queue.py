@@ -0,0 +1,41 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from django.core.management.base import BaseCommand
+
+from toolhub.apps.search.indexing import process_queue
+
+
+class Command(BaseCommand):
+    """Retry queued search index updates."""
+
+    help = "Retry search index updates that failed earlier"  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of objects to send per request "
+            "(default: settings.SEARCH_INDEX_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        """Process the queue."""
+        updated, failed = process_queue(options["batch_size"])
+        self.stdout.write("{} updated, {} failed".format(updated, failed))
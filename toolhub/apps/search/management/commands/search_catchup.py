@@ -0,0 +1,105 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from django_elasticsearch_dsl.registries import registry
+
+from toolhub.apps.search import indexing
+from toolhub.apps.search.models import IndexCheckpoint
+
+
+def datetime_arg(value):
+    """Parse an ISO 8601 date and time."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+class Command(BaseCommand):
+    """Send changes made since the last catch-up to the search index."""
+
+    help = (  # noqa: A003
+        "Update search indices with objects modified since the stored "
+        "checkpoint of each index"
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--since",
+            type=datetime_arg,
+            default=None,
+            help="Update objects modified at or after this ISO 8601 time "
+            "instead of the stored checkpoint",
+        )
+        parser.add_argument(
+            "--overlap",
+            type=int,
+            default=60,
+            help="Seconds to look back before the checkpoint to include "
+            "changes committed late (default: 60)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Number of objects to send per request "
+            "(default: settings.SEARCH_INDEX_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        for doc in registry.get_documents():
+            model = doc.django.model
+            fields = [field.name for field in model._meta.fields]
+            if "modified_date" not in fields:
+                continue
+            self.catch_up(doc, options)
+
+    def catch_up(self, doc, options):
+        """Update one index and advance its checkpoint."""
+        index = doc._index._name
+        started = timezone.now()
+        since = options["since"]
+        if since is None:
+            checkpoint = IndexCheckpoint.objects.filter(index=index).first()
+            if checkpoint is None:
+                raise CommandError(
+                    "No checkpoint for {}. Use --since or run "
+                    "search_reindex.".format(index)
+                )
+            since = checkpoint.modified_date - datetime.timedelta(
+                seconds=options["overlap"]
+            )
+        updated, failed = indexing.catch_up(doc, since, options["chunk_size"])
+        self.stdout.write(
+            "{}: {} updated, {} failed since {}".format(
+                index, updated, failed, since.isoformat()
+            )
+        )
+        IndexCheckpoint.objects.update_or_create(
+            index=index, defaults={"modified_date": started}
+        )
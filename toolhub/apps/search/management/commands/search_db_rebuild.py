@@ -0,0 +1,43 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from django.core.management.base import BaseCommand
+
+from toolhub.apps.search.models import ToolSearchIndex
+
+
+class Command(BaseCommand):
+    """Rebuild the database search tables."""
+
+    help = (  # noqa: A003
+        "Rebuild the database search index of all tools. Run after "
+        "migrating an existing installation."
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of tools to index per batch (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        """Rebuild the tables."""
+        count = ToolSearchIndex.objects.rebuild(options["chunk_size"])
+        self.stdout.write("{} tools indexed".format(count))
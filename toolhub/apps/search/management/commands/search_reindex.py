@@ -0,0 +1,161 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import re
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from django_elasticsearch_dsl.registries import registry
+
+from elasticsearch.helpers import parallel_bulk
+
+from toolhub.apps.search import cache
+from toolhub.apps.search import indexing
+from toolhub.apps.search.models import IndexCheckpoint
+
+
+class Command(BaseCommand):
+    """Rebuild search indices behind an alias."""
+
+    help = (  # noqa: A003
+        "Build a new versioned index for each search document, then "
+        "atomically point the document's alias at it"
+    )
+
+    def add_arguments(self, parser):
+        """Add command line arguments."""
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of documents per bulk request",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Number of parallel bulk requests",
+        )
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=1,
+            help="Number of previous indices to keep for rollback",
+        )
+
+    def handle(self, *args, **options):
+        """Execute the command."""
+        for doc in registry.get_documents():
+            self.reindex(doc, options)
+
+    def reindex(self, doc, options):
+        """Build a new index for a document and move the alias to it."""
+        client = doc._get_connection()
+        alias = doc._index._name
+        started = timezone.now()
+        name = "{}-{}".format(alias, started.strftime("%Y%m%d%H%M%S"))
+        doc._index.clone(name=name).create(using=client)
+        populated = False
+        try:
+            count = self.populate(doc, client, name, options)
+            client.indices.refresh(index=name)
+            indexed = client.count(index=name)["count"]
+            if indexed != count:
+                raise CommandError(
+                    "Expected {} documents in {}, found {}".format(
+                        count, name, indexed
+                    )
+                )
+            populated = True
+        finally:
+            if not populated:
+                # Do not leave a partial index behind
+                client.indices.delete(index=name, ignore=404)
+        self.stdout.write("Indexed {} documents in {}".format(count, name))
+
+        self.swap_alias(client, alias, name)
+        self.stdout.write("Moved alias {} to {}".format(alias, name))
+        self.catch_up(doc, started)
+        self.prune(client, alias, name, options["keep"])
+
+    def populate(self, doc, client, name, options):
+        """Stream all documents into a new index.
+
+        :returns: number of documents sent
+        """
+        instance = doc()
+        queryset = instance.get_queryset().order_by("pk")
+        count = 0
+
+        def actions():
+            nonlocal count
+            for obj in queryset.iterator(chunk_size=options["chunk_size"]):
+                action = instance._prepare_action(obj, "index")
+                action["_index"] = name
+                count += 1
+                yield action
+
+        for _ in parallel_bulk(
+            client,
+            actions(),
+            thread_count=options["threads"],
+            chunk_size=options["chunk_size"],
+        ):
+            pass
+        return count
+
+    def swap_alias(self, client, alias, name):
+        """Atomically point an alias at a new index."""
+        actions = [{"add": {"index": name, "alias": alias}}]
+        if client.indices.exists_alias(name=alias):
+            for index in client.indices.get_alias(name=alias):
+                actions.insert(0, {"remove": {"index": index, "alias": alias}})
+        elif client.indices.exists(index=alias):
+            # Replace an index created before aliases were used
+            actions.insert(0, {"remove_index": {"index": alias}})
+        client.indices.update_aliases(body={"actions": actions})
+        cache.bump_generation()
+
+    def catch_up(self, doc, started):
+        """Update documents which changed while the new index was built.
+
+        Changes made before the alias moved were sent to the old index.
+        The index's checkpoint is moved to the start of the rebuild.
+        """
+        model = doc.django.model
+        fields = [field.name for field in model._meta.fields]
+        if "modified_date" not in fields:
+            return
+        indexing.catch_up(doc, started)
+        IndexCheckpoint.objects.update_or_create(
+            index=doc._index._name, defaults={"modified_date": started}
+        )
+
+    def prune(self, client, alias, name, keep):
+        """Delete all but the newest `keep` previous indices."""
+        pattern = re.compile(r"^{}-\d{{14}}$".format(re.escape(alias)))
+        previous = sorted(
+            index
+            for index in client.indices.get(index="{}-*".format(alias))
+            if pattern.match(index) and index != name
+        )
+        end = max(0, len(previous) - keep)
+        for index in previous[:end]:
+            client.indices.delete(index=index)
+            self.stdout.write("Deleted {}".format(index))
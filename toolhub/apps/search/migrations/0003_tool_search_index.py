@@ -0,0 +1,56 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_fulltext_index(apps, schema_editor):
+    """Add a FULLTEXT index for MATCH ... AGAINST queries on MySQL."""
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        "CREATE FULLTEXT INDEX search_toolsearchindex_text_ft "
+        "ON search_toolsearchindex (text)"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    """Remove the MySQL FULLTEXT index."""
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        "DROP INDEX search_toolsearchindex_text_ft "
+        "ON search_toolsearchindex"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toolinfo', '0013_update_help_text'),
+        ('search', '0002_indexcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToolSearchIndex',
+            fields=[
+                ('tool', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='toolinfo.Tool')),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ToolSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=64)),
+                ('value', models.CharField(max_length=255)),
+                ('tool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='toolinfo.Tool')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='toolsearchterm',
+            index=models.Index(fields=['field', 'value'], name='search_tool_field_1aebf4_idx'),
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
@@ -15,3 +15,198 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from django.conf import settings
+from django.db import models
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from safedelete.signals import post_softdelete
+from safedelete.signals import post_undelete
+
+from toolhub.apps.toolinfo.models import Tool
+from toolhub.apps.toolinfo.signals import post_bulk_delete
+from toolhub.apps.toolinfo.signals import post_bulk_save
+
+from .documents import ToolDocument
+
+
+class IndexQueue(models.Model):
+    """An object whose search index update failed and must be retried."""
+
+    content_type = models.ForeignKey(
+        to="contenttypes.ContentType",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    object_id = models.BigIntegerField()
+    created_date = models.DateTimeField(auto_now_add=True, editable=False)
+    attempts = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        """Metadata for model."""
+
+        unique_together = ("content_type", "object_id")
+
+    def __str__(self):
+        return "{}:{}".format(self.content_type_id, self.object_id)
+
+
+class IndexCheckpoint(models.Model):
+    """Time up to which all changes have been sent to a search index."""
+
+    index = models.CharField(max_length=255, unique=True)
+    modified_date = models.DateTimeField()
+
+    def __str__(self):
+        return "{}@{}".format(self.index, self.modified_date.isoformat())
+
+
+class ToolSearchIndexManager(models.Manager):
+    """Custom manager for ToolSearchIndex models."""
+
+    # Document fields whose text is searched by DatabaseSearch
+    TEXT_FIELDS = (
+        "name",
+        "title",
+        "keywords",
+        "subtitle",
+        "author",
+        "description",
+    )
+
+    # Document fields which can be filtered and faceted by DatabaseSearch
+    TERM_FIELDS = (
+        "name",
+        "for_wikis",
+        "tool_type",
+        "author",
+        "license",
+        "available_ui_languages",
+        "keywords",
+        "origin",
+    )
+
+    # Longest term value stored, like `ignore_above` of keyword subfields
+    MAX_TERM_LENGTH = 255
+
+    @staticmethod
+    def _values(value):
+        """Normalize a document field value to a list of strings."""
+        if value is None or value == "":
+            return []
+        if isinstance(value, (list, tuple)):
+            return [str(item) for item in value if item not in (None, "")]
+        return [str(value)]
+
+    def update_tools(self, tools):
+        """Replace the search rows of Tools.
+
+        Rows of soft deleted Tools are removed.
+
+        :param tools: Tools that were saved or deleted
+        :type tools: list(Tool)
+        """
+        if not tools:
+            return
+        pks = [tool.pk for tool in tools]
+        live = [tool for tool in tools if tool.deleted is None]
+        doc = ToolDocument()
+        rows = []
+        terms = []
+        for tool in live:
+            data = doc.prepare(tool)
+            text = []
+            for field in self.TEXT_FIELDS:
+                text.extend(self._values(data.get(field)))
+            rows.append(self.model(tool_id=tool.pk, text="\n".join(text)))
+            for field in self.TERM_FIELDS:
+                for value in set(self._values(data.get(field))):
+                    if len(value) <= self.MAX_TERM_LENGTH:
+                        terms.append(
+                            ToolSearchTerm(
+                                tool_id=tool.pk, field=field, value=value
+                            )
+                        )
+        with transaction.atomic():
+            ToolSearchTerm.objects.filter(tool_id__in=pks).delete()
+            self.filter(tool_id__in=pks).delete()
+            self.bulk_create(rows, batch_size=Tool.objects.BULK_BATCH_SIZE)
+            ToolSearchTerm.objects.bulk_create(
+                terms, batch_size=Tool.objects.BULK_BATCH_SIZE
+            )
+
+    def rebuild(self, chunk_size=500):
+        """Rebuild the search rows of all Tools.
+
+        :returns: number of Tools indexed
+        :rtype: int
+        """
+        with transaction.atomic():
+            ToolSearchTerm.objects.all().delete()
+            self.all().delete()
+            tools = Tool.objects.select_related("created_by").order_by("pk")
+            count = 0
+            chunk = []
+            for tool in tools.iterator(chunk_size=chunk_size):
+                chunk.append(tool)
+                if len(chunk) == chunk_size:
+                    self.update_tools(chunk)
+                    count += len(chunk)
+                    chunk = []
+            self.update_tools(chunk)
+            count += len(chunk)
+        return count
+
+
+class ToolSearchIndex(models.Model):
+    """Searchable text of a Tool for the database search backend.
+
+    On MySQL the text column has a FULLTEXT index.
+    """
+
+    tool = models.OneToOneField(
+        Tool,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="+",
+    )
+    text = models.TextField()
+
+    objects = ToolSearchIndexManager()
+
+    def __str__(self):
+        return str(self.tool_id)
+
+
+class ToolSearchTerm(models.Model):
+    """A filterable value of a Tool for the database search backend."""
+
+    tool = models.ForeignKey(Tool, on_delete=models.CASCADE, related_name="+")
+    field = models.CharField(max_length=64)
+    value = models.CharField(max_length=255)
+
+    class Meta:
+        """Metadata for model."""
+
+        indexes = [models.Index(fields=["field", "value"])]
+
+    def __str__(self):
+        return "{}:{}={}".format(self.tool_id, self.field, self.value)
+
+
+@receiver(post_save, sender=Tool)
+@receiver(post_softdelete, sender=Tool)
+@receiver(post_undelete, sender=Tool)
+def update_tool_search_index(sender, instance, **kwargs):  # noqa: W0613
+    """Keep the database search index current after a Tool changes."""
+    if settings.SEARCH_DB_INDEX:
+        ToolSearchIndex.objects.update_tools([instance])
+
+
+@receiver(post_bulk_save, sender=Tool)
+@receiver(post_bulk_delete, sender=Tool)
+def bulk_update_tool_search_index(sender, instances, **kwargs):  # noqa: W0613
+    """Keep the database search index current after bulk Tool changes."""
+    if settings.SEARCH_DB_INDEX:
+        ToolSearchIndex.objects.update_tools(instances)
@@ -19,6 +19,8 @@ from django.utils.translation import gettext_lazy as _
 
 from django_elasticsearch_dsl_drf.serializers import DocumentSerializer
 
+from rest_framework import serializers
+
 from toolhub.decorators import doc
 
 from .documents import ToolDocument
@@ -45,3 +47,11 @@ class ToolDocumentSerializer(DocumentSerializer):
         document = ToolDocument
         fields = ToolDocument.Django.fields.copy()
         fields.append("created_by")
+
+
+@doc(_("Tool autocomplete suggestion"))  # noqa: W0223
+class AutocompleteSerializer(serializers.Serializer):
+    """Tool autocomplete suggestion."""
+
+    name = serializers.CharField(read_only=True, help_text=_("Tool name"))
+    title = serializers.CharField(read_only=True, help_text=_("Tool title"))
@@ -15,11 +15,18 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from django_elasticsearch_dsl.apps import DEDConfig
+from django_elasticsearch_dsl.registries import registry
 from django_elasticsearch_dsl.signals import RealTimeSignalProcessor
 
 from safedelete.models import SafeDeleteModel
 from safedelete.signals import post_softdelete
 
+from toolhub.apps.toolinfo.signals import post_bulk_delete
+from toolhub.apps.toolinfo.signals import post_bulk_save
+
+from . import indexing
+
 
 class SignalProcessor(RealTimeSignalProcessor):
     """Update index based on signals."""
@@ -32,12 +39,77 @@ class SignalProcessor(RealTimeSignalProcessor):
                 return
         super().handle_save(sender, instance, **kwargs)
 
+    def handle_bulk_save(self, sender, instances, **kwargs):
+        """Handle bulk save with a single bulk index request per document."""
+        if not DEDConfig.autosync_enabled():
+            return
+        instances = [
+            instance
+            for instance in instances
+            if not isinstance(instance, SafeDeleteModel)
+            or instance.deleted is None
+        ]
+        if not instances:
+            return
+        for doc in registry.get_documents([sender]):
+            if not doc.django.ignore_signals:
+                doc().update(instances)
+
+    def handle_bulk_delete(self, sender, instances, **kwargs):
+        """Handle bulk delete with a single bulk request per document."""
+        if not DEDConfig.autosync_enabled():
+            return
+        for doc in registry.get_documents([sender]):
+            if not doc.django.ignore_signals:
+                doc().update(instances, action="delete", raise_on_error=False)
+
     def setup(self):
         """Setup signals."""
         super().setup()
         post_softdelete.connect(self.handle_delete)
+        post_bulk_save.connect(self.handle_bulk_save)
+        post_bulk_delete.connect(self.handle_bulk_delete)
 
     def teardown(self):
         """Teardown signals."""
+        post_bulk_delete.disconnect(self.handle_bulk_delete)
+        post_bulk_save.disconnect(self.handle_bulk_save)
         post_softdelete.disconnect(self.handle_delete)
         super().teardown()
+
+
+class DeferredSignalProcessor(SignalProcessor):
+    """Update index in batches after the database transaction commits.
+
+    Changed objects are collected with `indexing.add` and sent to
+    Elasticsearch with one bulk request per document type. Failed updates
+    are retried and then queued in the database for
+    `process_search_queue`.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        """Handle save."""
+        if not DEDConfig.autosync_enabled():
+            return
+        if registry.get_documents([sender]):
+            indexing.add(sender, [instance.pk])
+        registry.update_related(instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        """Handle delete."""
+        if not DEDConfig.autosync_enabled():
+            return
+        if registry.get_documents([sender]):
+            indexing.add(sender, [instance.pk])
+
+    def handle_bulk_save(self, sender, instances, **kwargs):
+        """Handle bulk save."""
+        if not DEDConfig.autosync_enabled():
+            return
+        indexing.add(sender, [instance.pk for instance in instances])
+
+    def handle_bulk_delete(self, sender, instances, **kwargs):
+        """Handle bulk delete."""
+        if not DEDConfig.autosync_enabled():
+            return
+        indexing.add(sender, [instance.pk for instance in instances])
@@ -0,0 +1,125 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from collections import OrderedDict
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase
+from django.test import override_settings
+
+from django_elasticsearch_dsl_drf.viewsets import BaseDocumentViewSet
+
+from rest_framework.response import Response
+
+from .. import cache as search_cache
+from ..views import CachedFacetsFilterBackend
+
+
+class SearchCacheTest(TestCase):
+    """Test search result caching."""
+
+    url = "/api/search/tools/"
+
+    def setUp(self):
+        """Setup for each test."""
+        cache.clear()
+        self.calls = []
+        patcher = mock.patch.object(
+            BaseDocumentViewSet,
+            "list",
+            autospec=True,
+            side_effect=self.fake_list,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_list(self, view, request, *args, **kwargs):
+        """Stand in for the Elasticsearch query."""
+        self.calls.append(view.cached_facets)
+        data = OrderedDict(count=1, next=None, previous=None)
+        if view.cached_facets is None:
+            data["facets"] = {"call": len(self.calls)}
+        data["results"] = [{"call": len(self.calls)}]
+        return Response(data)
+
+    def test_normalize_params(self):
+        """Parameter and value order does not matter."""
+        self.assertEqual(
+            search_cache.normalize_params(QueryDict("q=x&b=2&b=1")),
+            search_cache.normalize_params(QueryDict("b=1&q=x&b=2")),
+        )
+
+    def test_generation(self):
+        """Bumping the generation changes cache keys."""
+        generation = search_cache.get_generation()
+        key = search_cache.make_key("results", "a")
+        self.assertEqual(search_cache.make_key("results", "a"), key)
+        search_cache.bump_generation()
+        self.assertEqual(search_cache.get_generation(), generation + 1)
+        self.assertNotEqual(search_cache.make_key("results", "a"), key)
+
+        cache.delete(search_cache.GENERATION_KEY)
+        search_cache.bump_generation()
+        self.assertIsNotNone(search_cache.get_generation())
+
+    def test_results(self):
+        """Identical searches are answered from the cache."""
+        first = self.client.get(self.url, {"q": "x", "tool_type__term": "bot"})
+        second = self.client.get(
+            self.url, {"tool_type__term": "bot", "q": "x"}
+        )
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second.json(), first.json())
+
+        search_cache.bump_generation()
+        self.client.get(self.url, {"q": "x", "tool_type__term": "bot"})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_facets(self):
+        """Other pages of a search reuse its facets."""
+        self.client.get(self.url, {"q": "x"})
+        response = self.client.get(self.url, {"q": "x", "page": 2})
+        self.assertEqual(self.calls, [None, {"call": 1}])
+        data = response.json()
+        self.assertEqual(data["facets"], {"call": 1})
+        self.assertEqual(data["results"], [{"call": 2}])
+        self.assertEqual(list(data)[-1], "results")
+
+        self.client.get(self.url, {"q": "y", "page": 2})
+        self.assertEqual(self.calls[-1], None)
+
+        with override_settings(SEARCH_PROFILE="all_fields"):
+            self.client.get(self.url, {"q": "x", "page": 3})
+        self.assertEqual(self.calls[-1], None)
+
+    @override_settings(SEARCH_CACHE_TTL=0)
+    def test_disabled(self):
+        """Caching can be disabled."""
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(self.calls, [None, None])
+
+    def test_facet_backend(self):
+        """Aggregations are skipped when facets are cached."""
+        view = mock.Mock(cached_facets={})
+        queryset = mock.Mock()
+        self.assertIs(
+            CachedFacetsFilterBackend().filter_queryset(None, queryset, view),
+            queryset,
+        )
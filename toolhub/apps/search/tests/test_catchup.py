@@ -0,0 +1,69 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import datetime
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from ..documents import ToolDocument
+from ..management.commands import search_catchup
+from ..models import IndexCheckpoint
+
+
+@mock.patch.object(search_catchup.indexing, "catch_up", return_value=(2, 1))
+class SearchCatchupTest(TestCase):
+    """Test the search_catchup command."""
+
+    def test_checkpoint(self, catch_up):
+        """Changes since the checkpoint are sent and it is advanced."""
+        mark = timezone.now() - datetime.timedelta(hours=1)
+        IndexCheckpoint.objects.create(index="tools", modified_date=mark)
+        out = io.StringIO()
+        call_command("search_catchup", "--overlap=30", stdout=out)
+        catch_up.assert_called_once_with(
+            ToolDocument, mark - datetime.timedelta(seconds=30), None
+        )
+        self.assertIn("tools: 2 updated, 1 failed", out.getvalue())
+        self.assertGreater(
+            IndexCheckpoint.objects.get(index="tools").modified_date, mark
+        )
+
+    def test_since(self, catch_up):
+        """An explicit start time overrides the checkpoint."""
+        call_command(
+            "search_catchup",
+            "--since=2020-11-01T12:00:00",
+            "--chunk-size=10",
+            stdout=io.StringIO(),
+        )
+        catch_up.assert_called_once_with(
+            ToolDocument,
+            datetime.datetime(2020, 11, 1, 12, tzinfo=datetime.timezone.utc),
+            10,
+        )
+        self.assertTrue(IndexCheckpoint.objects.filter(index="tools").exists())
+
+    def test_no_checkpoint(self, catch_up):
+        """A start time is required without a checkpoint."""
+        with self.assertRaises(CommandError):
+            call_command("search_catchup", stdout=io.StringIO())
+        catch_up.assert_not_called()
@@ -0,0 +1,263 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+
+from elasticsearch.exceptions import ConnectionError
+from elasticsearch.exceptions import RequestError
+
+from elasticsearch_dsl.connections import connections
+
+from toolhub.apps.toolinfo.models import Tool
+from toolhub.apps.user.models import ToolhubUser
+
+from ..dbsearch import DatabaseSearch
+from ..models import ToolSearchIndex
+from ..models import ToolSearchTerm
+
+
+class ToolSearchIndexTest(TestCase):
+    """Test maintenance of the database search tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Setup for all tests in this TestCase."""
+        cls.user = ToolhubUser.objects.create_user(  # nosec: B106
+            username="Searcher", password="unused"
+        )
+
+    def create_tool(self, name, **kwargs):
+        """Create a tool."""
+        record = {
+            "name": name,
+            "title": "Tool {}".format(name),
+            "description": "A tool",
+            "url": "https://example.org/{}".format(name),
+        }
+        record.update(kwargs)
+        return Tool.objects.from_toolinfo(record, self.user, Tool.ORIGIN_API)[
+            0
+        ]
+
+    def terms(self, tool):
+        """Get the search terms of a tool."""
+        return set(
+            ToolSearchTerm.objects.filter(tool=tool).values_list(
+                "field", "value"
+            )
+        )
+
+    def test_save(self):
+        """Saving a tool updates its rows."""
+        tool = self.create_tool("dbsearch-save", keywords=["bot", "wiki"])
+        self.assertIn("bot", ToolSearchIndex.objects.get(tool=tool).text)
+        self.assertTrue(
+            {("keywords", "bot"), ("keywords", "wiki")} <= self.terms(tool)
+        )
+
+        tool.keywords = ["maps"]
+        tool.save()
+        terms = self.terms(tool)
+        self.assertIn(("keywords", "maps"), terms)
+        self.assertNotIn(("keywords", "bot"), terms)
+
+    def test_delete(self):
+        """Deleted tools are removed from the index."""
+        tool = self.create_tool("dbsearch-delete")
+        tool.delete()
+        self.assertFalse(ToolSearchIndex.objects.filter(tool=tool).exists())
+        self.assertFalse(self.terms(tool))
+
+        other = self.create_tool("dbsearch-bulk-delete")
+        Tool.objects.bulk_soft_delete([other.name], self.user)
+        self.assertFalse(ToolSearchIndex.objects.filter(tool=other).exists())
+
+    def test_rebuild(self):
+        """The tables can be rebuilt from scratch."""
+        tool = self.create_tool("dbsearch-rebuild")
+        ToolSearchIndex.objects.all().delete()
+        count = ToolSearchIndex.objects.rebuild(chunk_size=1)
+        self.assertEqual(count, Tool.objects.count())
+        self.assertTrue(ToolSearchIndex.objects.filter(tool=tool).exists())
+
+    @override_settings(SEARCH_DB_INDEX=False)
+    def test_disabled(self):
+        """Rows are not maintained when disabled."""
+        tool = self.create_tool("dbsearch-disabled")
+        self.assertFalse(ToolSearchIndex.objects.filter(tool=tool).exists())
+
+
+@override_settings(SEARCH_BACKEND="database", SEARCH_CACHE_TTL=0)
+class DatabaseSearchTest(TestCase):
+    """Test searching with the database backend."""
+
+    url = "/api/search/tools/"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Setup for all tests in this TestCase."""
+        cls.user = ToolhubUser.objects.create_user(  # nosec: B106
+            username="Searcher", password="unused"
+        )
+        for name, title, keywords, wikis in (
+            ("db-alpha", "Alpha bot", ["bot"], ["enwiki"]),
+            ("db-beta", "Beta editor", ["editor"], ["enwiki", "dewiki"]),
+            ("db-gamma", "Gamma bot", ["bot", "editor"], []),
+        ):
+            Tool.objects.from_toolinfo(
+                {
+                    "name": name,
+                    "title": title,
+                    "description": "Tool {}".format(title),
+                    "url": "https://example.org/{}".format(name),
+                    "keywords": keywords,
+                    "for_wikis": wikis,
+                },
+                cls.user,
+                Tool.ORIGIN_API,
+            )
+
+    def setUp(self):
+        """Setup for each test."""
+        cache.clear()
+        self.client_es = mock.MagicMock()
+        patcher = mock.patch.object(
+            connections, "get_connection", return_value=self.client_es
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, **params):
+        """Search and return the response data."""
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, data):
+        """Get the tool names of results."""
+        return [result["name"] for result in data["results"]]
+
+    def test_query(self):
+        """Full text search matches every word."""
+        data = self.search(q="bot", ordering="name")
+        self.assertEqual(self.names(data), ["db-alpha", "db-gamma"])
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["results"][0]["title"], "Alpha bot")
+        self.assertEqual(
+            data["results"][0]["created_by"]["username"], "Searcher"
+        )
+        self.assertEqual(self.names(self.search(q="+bot gamma")), ["db-gamma"])
+        self.assertEqual(self.names(self.search(q="bot -gamma")), ["db-alpha"])
+        self.client_es.search.assert_not_called()
+
+    def test_short_words(self):
+        """Words missing from a FULLTEXT index are matched as substrings."""
+        with mock.patch("toolhub.apps.search.dbsearch.connection") as conn:
+            conn.vendor = "mysql"
+            data = self.search(q="bot to", ordering="name")
+            self.assertEqual(self.names(data), ["db-alpha", "db-gamma"])
+            data = self.search(q="bot -ed", ordering="name")
+            self.assertEqual(self.names(data), ["db-alpha"])
+
+        search = DatabaseSearch(None, mock.Mock(query_params={"q": "ip maps"}))
+        search.fulltext = True
+        sql = str(search.search_queryset(ToolSearchIndex.objects.all()).query)
+        self.assertIn("MATCH", sql)
+        self.assertIn("+maps*", sql)
+        self.assertNotIn("+ip*", sql)
+        self.assertIn("LIKE", sql)
+
+    def test_filters(self):
+        """Term and isnull filters are applied."""
+        data = self.search(keywords__term="editor", ordering="-name")
+        self.assertEqual(self.names(data), ["db-gamma", "db-beta"])
+        data = self.search(keywords__term="editor", wiki__term="dewiki")
+        self.assertEqual(self.names(data), ["db-beta"])
+        data = self.search(wiki__isnull="true", q="db")
+        self.assertEqual(self.names(data), ["db-gamma"])
+        data = self.search(name__in="db-alpha__db-beta", ordering="name")
+        self.assertEqual(self.names(data), ["db-alpha", "db-beta"])
+
+    def test_facets(self):
+        """Facet counts match the Elasticsearch response shape."""
+        facets = self.search(q="db")["facets"]
+        wiki = facets["_filter_wiki"]
+        self.assertEqual(wiki["doc_count"], 3)
+        self.assertEqual(wiki["wiki"]["meta"]["param"], "wiki__term")
+        self.assertEqual(
+            wiki["wiki"]["buckets"],
+            [
+                {"key": "enwiki", "doc_count": 2},
+                {"key": "--", "doc_count": 1},
+                {"key": "dewiki", "doc_count": 1},
+            ],
+        )
+        keywords = self.search(q="bot")["facets"]["_filter_keywords"]
+        self.assertEqual(
+            keywords["keywords"]["buckets"],
+            [
+                {"key": "bot", "doc_count": 2},
+                {"key": "editor", "doc_count": 1},
+            ],
+        )
+
+    def test_paging(self):
+        """Results are paged by page number."""
+        data = self.search(q="db", ordering="name", page_size=2)
+        self.assertEqual(self.names(data), ["db-alpha", "db-beta"])
+        self.assertIsNone(data["previous"])
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(self.names(data), ["db-gamma"])
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+        data = self.search(q="db", ordering="name", page_size=2, cursor="")
+        self.assertNotIn("cursor", data["next"])
+        response = self.client.get(self.url, {"page": 5})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SEARCH_BACKEND="elasticsearch")
+    def test_fallback(self):
+        """Searches fall back to the database when Elasticsearch is down."""
+        self.client_es.search.side_effect = ConnectionError("N/A", "down")
+        data = self.search(q="beta")
+        self.assertEqual(self.names(data), ["db-beta"])
+        self.client_es.search.assert_called()
+
+        with override_settings(SEARCH_DB_FALLBACK=False):
+            with self.assertRaises(ConnectionError):
+                self.client.get(self.url, {"q": "beta"})
+
+    @override_settings(SEARCH_BACKEND="elasticsearch", SEARCH_CACHE_TTL=60)
+    def test_fallback_not_cached(self):
+        """Database fallback results are not cached."""
+        cache.clear()
+        self.client_es.search.side_effect = ConnectionError("N/A", "down")
+        self.search(q="beta")
+        self.client_es.search.reset_mock()
+        self.search(q="beta")
+        self.client_es.search.assert_called()
+
+    @override_settings(SEARCH_BACKEND="elasticsearch")
+    def test_no_fallback_on_bad_request(self):
+        """Client errors from Elasticsearch are not hidden."""
+        self.client_es.search.side_effect = RequestError(400, "bad", {})
+        with self.assertRaises(RequestError):
+            self.client.get(self.url, {"q": "beta"})
@@ -0,0 +1,206 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from unittest import mock
+
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+
+from elasticsearch.exceptions import ConnectionError
+
+from toolhub.apps.toolinfo.models import Tool
+from toolhub.apps.user.models import ToolhubUser
+
+from .. import indexing
+from ..documents import ToolDocument
+from ..models import IndexQueue
+
+
+@override_settings(SEARCH_INDEX_MAX_RETRIES=2, SEARCH_INDEX_RETRY_DELAY=0)
+class IndexingTest(TestCase):
+    """Test deferred search indexing."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Setup for all tests in this TestCase."""
+        cls.user = ToolhubUser.objects.create_user(  # nosec: B106
+            username="Indexer", password="unused"
+        )
+        cls.tools = [
+            Tool.objects.from_toolinfo(
+                {
+                    "name": "index-{}".format(i),
+                    "title": "Index",
+                    "description": "Index",
+                    "url": "https://example.org/index",
+                },
+                cls.user,
+                Tool.ORIGIN_CRAWLER,
+            )[0]
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        """Drop updates left pending by a test."""
+        indexing._get_state().pending = {}
+
+    @override_settings(ELASTICSEARCH_DSL_AUTOSYNC=True)
+    def test_signals(self):
+        """Saving a tool schedules an update instead of indexing it."""
+        with mock.patch.object(indexing, "add") as add, mock.patch.object(
+            ToolDocument, "bulk"
+        ) as bulk:
+            tool = self.tools[0]
+            tool.title = "Changed"
+            tool.save()
+            Tool.objects.bulk_soft_delete([tool.name], self.user)
+        add.assert_has_calls(
+            [mock.call(Tool, [tool.pk]), mock.call(Tool, [tool.pk])]
+        )
+        bulk.assert_not_called()
+
+    @mock.patch.object(indexing.transaction, "on_commit")
+    def test_deferred(self, on_commit):
+        """Updates are held until the outermost deferred block exits."""
+        with indexing.deferred():
+            with indexing.deferred():
+                indexing.add(Tool, [1])
+            indexing.add(Tool, [2])
+            on_commit.assert_not_called()
+            with override_settings(SEARCH_INDEX_BATCH_SIZE=3):
+                indexing.add(Tool, [3])
+            on_commit.assert_called_once_with(indexing.flush)
+        self.assertEqual(on_commit.call_count, 2)
+        self.assertEqual(indexing._get_state().pending, {Tool: {1, 2, 3}})
+
+        indexing.add(Tool, [4])
+        self.assertEqual(on_commit.call_count, 3)
+        on_commit.assert_called_with(indexing.flush_once)
+
+    @mock.patch.object(ToolDocument, "bulk", return_value=(3, []))
+    def test_flush(self, bulk):
+        """All pending updates are sent with a single request."""
+        self.tools[1].delete()
+        with mock.patch.object(indexing.transaction, "on_commit"):
+            indexing.add(Tool, [tool.pk for tool in self.tools])
+        indexing.flush()
+
+        bulk.assert_called_once()
+        actions = {
+            action["_id"]: action["_op_type"]
+            for action in bulk.call_args[0][0]
+        }
+        self.assertEqual(
+            actions,
+            {
+                self.tools[0].pk: "index",
+                self.tools[1].pk: "delete",
+                self.tools[2].pk: "index",
+            },
+        )
+        self.assertEqual(indexing._get_state().pending, {})
+        self.assertFalse(IndexQueue.objects.exists())
+
+    def test_retry(self):
+        """Failed updates are retried and then queued."""
+        tool = self.tools[0]
+        error = {"index": {"_id": str(tool.pk), "status": 429}}
+        with mock.patch.object(
+            ToolDocument,
+            "bulk",
+            side_effect=[
+                ConnectionError("N/A", "down", None),
+                (1, [error]),
+                (0, [error]),
+            ],
+        ) as bulk, self.assertLogs("toolhub.apps.search", "WARNING"):
+            failed = indexing.index_objects(
+                ToolDocument, {tool.pk, self.tools[1].pk}
+            )
+        self.assertEqual(failed, {tool.pk})
+        self.assertEqual(bulk.call_count, 3)
+        # Only the failed document is sent again
+        self.assertEqual(len(bulk.call_args[0][0]), 1)
+
+    @mock.patch.object(indexing.time, "sleep")
+    def test_flush_once(self, sleep):
+        """Updates after a save are not retried and do not sleep."""
+        tool = self.tools[0]
+        with mock.patch.object(indexing.transaction, "on_commit") as on_commit:
+            indexing.add(Tool, [tool.pk])
+        callback = on_commit.call_args[0][0]
+        with mock.patch.object(
+            ToolDocument,
+            "bulk",
+            side_effect=ConnectionError("N/A", "down", None),
+        ) as bulk, self.assertLogs("toolhub.apps.search", "WARNING"):
+            callback()
+        bulk.assert_called_once()
+        sleep.assert_not_called()
+        self.assertEqual(
+            list(IndexQueue.objects.values_list("object_id", flat=True)),
+            [tool.pk],
+        )
+
+    @mock.patch.object(ToolDocument, "bulk", return_value=(2, []))
+    def test_catch_up(self, bulk):
+        """Only objects modified since the given time are sent."""
+        since = timezone.now()
+        Tool.objects.bulk_soft_delete([self.tools[0].name], self.user)
+        self.tools[1].save()
+
+        self.assertEqual(indexing.catch_up(ToolDocument, since), (2, 0))
+        actions = {
+            action["_id"]: action["_op_type"]
+            for action in bulk.call_args[0][0]
+        }
+        self.assertEqual(
+            actions,
+            {self.tools[0].pk: "delete", self.tools[1].pk: "index"},
+        )
+
+        bulk.reset_mock()
+        self.assertEqual(indexing.catch_up(ToolDocument, chunk_size=2), (3, 0))
+        self.assertEqual(bulk.call_count, 2)
+
+    def test_process_queue(self):
+        """Queued updates are sent again."""
+        pks = [tool.pk for tool in self.tools]
+        with self.assertLogs("toolhub.apps.search", "ERROR"):
+            indexing.enqueue(Tool, pks)
+            indexing.enqueue(Tool, pks[:1])
+        self.assertEqual(IndexQueue.objects.count(), 3)
+
+        def bulk(actions, **kwargs):
+            """Fail to index the first tool."""
+            errors = [
+                {"index": {"_id": str(action["_id"]), "status": 500}}
+                for action in actions
+                if action["_id"] == pks[0]
+            ]
+            return len(actions) - len(errors), errors
+
+        with mock.patch.object(
+            ToolDocument, "bulk", side_effect=bulk
+        ) as bulk, self.assertLogs("toolhub.apps.search", "WARNING"):
+            self.assertEqual(indexing.process_queue(batch_size=2), (2, 1))
+        # First batch is retried twice, second batch succeeds
+        self.assertEqual(bulk.call_count, 3 + 1)
+        queued = IndexQueue.objects.get()
+        self.assertEqual(queued.object_id, pks[0])
+        self.assertEqual(queued.attempts, 1)
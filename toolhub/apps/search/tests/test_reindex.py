@@ -0,0 +1,149 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from toolhub.apps.toolinfo.models import Tool
+from toolhub.apps.user.models import ToolhubUser
+
+from ..documents import ToolDocument
+from ..management.commands import search_reindex
+from ..models import IndexCheckpoint
+
+
+def fake_parallel_bulk(client, actions, **kwargs):
+    """Consume actions like elasticsearch.helpers.parallel_bulk."""
+    client.sent = list(actions)
+    # Simulate a change made while the index is being built
+    Tool.objects.filter(name="reindex-0").update(modified_date=timezone.now())
+    for action in client.sent:
+        yield True, {"index": {"_id": action["_id"]}}
+
+
+@mock.patch.object(search_reindex, "parallel_bulk", fake_parallel_bulk)
+class SearchReindexTest(TestCase):
+    """Test the search_reindex command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Setup for all tests in this TestCase."""
+        user = ToolhubUser.objects.create_user(  # nosec: B106
+            username="Reindexer", password="unused"
+        )
+        for i in range(3):
+            Tool.objects.from_toolinfo(
+                {
+                    "name": "reindex-{}".format(i),
+                    "title": "Reindex",
+                    "description": "Reindex",
+                    "url": "https://example.org/reindex",
+                },
+                user,
+                Tool.ORIGIN_CRAWLER,
+            )
+        Tool.objects.get(name="reindex-2").delete()
+
+    def setUp(self):
+        """Setup for each test."""
+        self.client = mock.MagicMock()
+        patcher = mock.patch.object(
+            ToolDocument, "_get_connection", return_value=self.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reindex(self):
+        """A new index is built and the alias is moved to it."""
+        self.client.count.return_value = {"count": 2}
+        self.client.indices.exists_alias.return_value = True
+        self.client.indices.get_alias.return_value = {
+            "tools-20200102000000": {"aliases": {"tools": {}}}
+        }
+        self.client.indices.get.return_value = {
+            "tools-20200101000000": {},
+            "tools-20200102000000": {},
+            "tools-backup": {},
+        }
+        out = io.StringIO()
+        with mock.patch.object(
+            search_reindex.indexing, "index_objects", return_value=set()
+        ) as index_objects:
+            call_command("search_reindex", stdout=out)
+
+        name = self.client.indices.create.call_args[1]["index"]
+        self.assertRegex(name, r"^tools-\d{14}$")
+        self.assertEqual(
+            sorted(action["_id"] for action in self.client.sent),
+            sorted(Tool.objects.values_list("pk", flat=True)),
+        )
+        for action in self.client.sent:
+            self.assertEqual(action["_index"], name)
+        self.client.indices.update_aliases.assert_called_once_with(
+            body={
+                "actions": [
+                    {
+                        "remove": {
+                            "index": "tools-20200102000000",
+                            "alias": "tools",
+                        }
+                    },
+                    {"add": {"index": name, "alias": "tools"}},
+                ]
+            }
+        )
+        # Tools changed while indexing are sent again
+        index_objects.assert_called_once_with(
+            ToolDocument, {Tool.objects.get(name="reindex-0").pk}
+        )
+        self.client.indices.delete.assert_called_once_with(
+            index="tools-20200101000000"
+        )
+        self.assertIn("Indexed 2 documents", out.getvalue())
+        self.assertTrue(IndexCheckpoint.objects.filter(index="tools").exists())
+
+    def test_replace_index(self):
+        """An unaliased index with the alias name is replaced."""
+        self.client.count.return_value = {"count": 2}
+        self.client.indices.exists_alias.return_value = False
+        self.client.indices.exists.return_value = True
+        self.client.indices.get.return_value = {}
+        with mock.patch.object(
+            search_reindex.indexing, "index_objects", return_value=set()
+        ):
+            call_command("search_reindex", "--keep=0", stdout=io.StringIO())
+        actions = self.client.indices.update_aliases.call_args[1]["body"][
+            "actions"
+        ]
+        self.assertEqual(actions[0], {"remove_index": {"index": "tools"}})
+        self.client.indices.delete.assert_not_called()
+
+    def test_count_mismatch(self):
+        """The new index is deleted if documents are missing."""
+        self.client.count.return_value = {"count": 1}
+        with self.assertRaises(CommandError):
+            call_command("search_reindex", stdout=io.StringIO())
+        name = self.client.indices.create.call_args[1]["index"]
+        self.client.indices.delete.assert_called_once_with(
+            index=name, ignore=404
+        )
+        self.client.indices.update_aliases.assert_not_called()
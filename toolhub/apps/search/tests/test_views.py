@@ -0,0 +1,265 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+
+from elasticsearch_dsl.connections import connections
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from toolhub.apps.toolinfo.models import Tool
+
+from .. import checks
+from ..documents import ToolDocument
+from ..serializers import ToolDocumentSerializer
+from ..views import Pagination
+from ..views import QueryStringFilterBackend
+from ..views import ToolDocumentViewSet
+
+
+class ToolDocumentViewSetTest(TestCase):
+    """Test ToolDocumentViewSet."""
+
+    def get_query(self, query):
+        """Build the full text query for a search."""
+        request = Request(APIRequestFactory().get("/", {"q": query}))
+        search = QueryStringFilterBackend().filter_queryset(
+            request, ToolDocument.search(), ToolDocumentViewSet()
+        )
+        return search.to_dict()["query"]["bool"]["must"][0]
+
+    def test_weighted_profile(self):
+        """Only weighted fields are searched by default."""
+        query = self.get_query('"bot tool"')["simple_query_string"]
+        self.assertEqual(query["query"], '"bot tool"')
+        self.assertEqual(
+            query["fields"],
+            [
+                "name^5",
+                "title^4",
+                "keywords^3",
+                "subtitle^2",
+                "author^2",
+                "description",
+            ],
+        )
+        self.assertEqual(query["quote_field_suffix"], ".exact")
+        self.assertNotIn("all_fields", query)
+
+    @override_settings(SEARCH_PROFILE="all_fields")
+    def test_all_fields_profile(self):
+        """All fields are searched by the all_fields profile."""
+        query = self.get_query("bot")["simple_query_string"]
+        self.assertFalse(query["fields"])
+        self.assertTrue(query["all_fields"])
+
+
+class SearchProfileCheckTest(TestCase):
+    """Test the SEARCH_PROFILE system check."""
+
+    def test_check(self):
+        """Unknown search profiles are reported."""
+        self.assertEqual(checks.check_search_profile(None), [])
+        with override_settings(SEARCH_PROFILE="typo"):
+            errors = checks.check_search_profile(None)
+        self.assertEqual([error.id for error in errors], ["search.E001"])
+
+
+class CursorPaginationTest(TestCase):
+    """Test search_after cursor pagination."""
+
+    url = "/api/search/tools/"
+
+    def setUp(self):
+        """Setup for each test."""
+        cache.clear()
+        self.client_es = mock.MagicMock()
+        self.client_es.search.side_effect = self.search
+        patcher = mock.patch.object(
+            connections, "get_connection", return_value=self.client_es
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, body, **kwargs):
+        """Return one page of three matching tools."""
+        names = ["a", "b", "c"]
+        if "search_after" in body:
+            start = names.index(body["search_after"][-1]) + 1
+            names = names[start:]
+        source = dict.fromkeys(ToolDocumentSerializer.Meta.fields)
+        hits = [
+            {
+                "_index": "tools",
+                "_type": "doc",
+                "_id": name,
+                "_score": 1.0,
+                "_source": dict(source, name=name, title=name.upper()),
+                "sort": [1.0, 1604000000000, name],
+            }
+            for name in names[: body["size"]]
+        ]
+        return {"hits": {"total": 3, "max_score": 1.0, "hits": hits}}
+
+    def test_cursor(self):
+        """Pages are fetched with search_after."""
+        response = self.client.get(self.url, {"cursor": "", "page_size": 2})
+        data = response.json()
+        self.assertEqual(data["count"], 3)
+        self.assertIsNone(data["previous"])
+        self.assertEqual([r["name"] for r in data["results"]], ["a", "b"])
+        body = self.client_es.search.call_args[1]["body"]
+        self.assertNotIn("search_after", body)
+        self.assertEqual(body["from"], 0)
+
+        response = self.client.get(data["next"])
+        data = response.json()
+        self.assertEqual([r["name"] for r in data["results"]], ["c"])
+        self.assertIsNone(data["next"])
+        body = self.client_es.search.call_args[1]["body"]
+        self.assertEqual(body["search_after"], [1.0, 1604000000000, "b"])
+        self.assertEqual(body["from"], 0)
+
+    def test_tiebreaker(self):
+        """A unique sort field is added to user provided orderings."""
+        self.client.get(self.url, {"cursor": "", "ordering": "title"})
+        body = self.client_es.search.call_args[1]["body"]
+        self.assertEqual(
+            body["sort"],
+            [{"title.keyword": {"order": "asc"}}, "name.keyword"],
+        )
+
+    def test_invalid_cursor(self):
+        """Invalid cursors are rejected."""
+        response = self.client.get(self.url, {"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 404)
+        self.client_es.search.assert_not_called()
+
+    def test_cursor_shape(self):
+        """Cursors must match the sort of the search."""
+        pagination = Pagination()
+        for values in (
+            {"a": 1},
+            [1.0, 1604000000000],
+            [1.0, 1604000000000, "b", "c"],
+            [1.0, "1604000000000", "b"],
+            [1.0, 1604000000000, 2],
+            [True, 1604000000000, "b"],
+            [None, 1604000000000, "b"],
+        ):
+            with self.subTest(values=values):
+                cursor = pagination.encode_cursor(values)
+                response = self.client.get(self.url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+        self.client_es.search.assert_not_called()
+
+        cursor = pagination.encode_cursor(["b"])
+        response = self.client.get(
+            self.url, {"cursor": cursor, "ordering": "name"}
+        )
+        self.assertEqual(response.status_code, 200)
+        body = self.client_es.search.call_args[1]["body"]
+        self.assertEqual(body["search_after"], ["b"])
+
+
+class AutocompleteViewSetTest(TestCase):
+    """Test AutocompleteViewSet."""
+
+    url = "/api/search/autocomplete/"
+
+    def setUp(self):
+        """Setup for each test."""
+        cache.clear()
+        self.client_es = mock.MagicMock()
+        self.client_es.search.return_value = {
+            "hits": {"total": 2, "hits": []},
+            "suggest": {
+                "tools": [
+                    {
+                        "text": "Bo",
+                        "options": [
+                            {
+                                "text": "bots",
+                                "_id": "1",
+                                "_source": {"name": "bots", "title": "Bots"},
+                            },
+                            {
+                                "text": "Bot tool",
+                                "_id": "2",
+                                "_source": {
+                                    "name": "tb",
+                                    "title": "Bot tool",
+                                },
+                            },
+                        ],
+                    }
+                ]
+            },
+        }
+        patcher = mock.patch.object(
+            connections, "get_connection", return_value=self.client_es
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_list(self):
+        """Suggestions are returned for a prefix."""
+        response = self.client.get(self.url, {"q": " Bo ", "limit": 100})
+        self.assertEqual(
+            response.json(),
+            [
+                {"name": "bots", "title": "Bots"},
+                {"name": "tb", "title": "Bot tool"},
+            ],
+        )
+        body = self.client_es.search.call_args[1]["body"]
+        self.assertEqual(body["size"], 0)
+        self.assertEqual(body["_source"], ["name", "title"])
+        self.assertEqual(
+            body["suggest"]["tools"],
+            {
+                "text": "Bo",
+                "completion": {
+                    "field": "suggest",
+                    "size": 25,
+                    "skip_duplicates": True,
+                },
+            },
+        )
+
+        # Repeated prefixes are served from the cache
+        self.client.get(self.url, {"q": "bo", "limit": 25})
+        self.assertEqual(self.client_es.search.call_count, 1)
+
+    def test_empty(self):
+        """No query is made for an empty prefix."""
+        response = self.client.get(self.url, {"q": " "})
+        self.assertEqual(response.json(), [])
+        self.client_es.search.assert_not_called()
+
+    def test_prepare_suggest(self):
+        """Tool names and titles are suggested."""
+        tool = Tool(name="a-tool", title="A tool")
+        self.assertEqual(
+            ToolDocument().prepare_suggest(tool),
+            {"input": ["a-tool", "A tool"]},
+        )
@@ -15,6 +15,13 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+import base64
+import json
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 
 from django_elasticsearch_dsl_drf import constants
@@ -22,14 +29,30 @@ from django_elasticsearch_dsl_drf import filter_backends
 from django_elasticsearch_dsl_drf import pagination
 from django_elasticsearch_dsl_drf.viewsets import BaseDocumentViewSet
 
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
 from drf_spectacular.utils import extend_schema
 from drf_spectacular.utils import extend_schema_view
 
+from elasticsearch.exceptions import TransportError
+
+from rest_framework import viewsets
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
+
+from . import cache as search_cache
+from .dbsearch import DatabaseSearch
 from .documents import ToolDocument
 from .schema import FACET_RESPONSE
+from .serializers import AutocompleteSerializer
 from .serializers import ToolDocumentSerializer
 
 
+logger = logging.getLogger(__name__)
+
+
 class QueryStringFilterBackend(  # noqa: W0223
     filter_backends.BaseSearchFilterBackend
 ):
@@ -41,8 +64,158 @@ class QueryStringFilterBackend(  # noqa: W0223
     ]
 
 
+class CachedFacetsFilterBackend(filter_backends.FacetedSearchFilterBackend):
+    """Faceted search backend that skips aggregations already cached."""
+
+    def filter_queryset(self, request, queryset, view):
+        """Add aggregations unless the view has cached facets."""
+        if getattr(view, "cached_facets", None) is not None:
+            return queryset
+        return super().filter_queryset(request, queryset, view)
+
+
 class Pagination(pagination.QueryFriendlyPageNumberPagination):
-    """Custom pagination for OpenAPI response generation."""
+    """Page number pagination with an opt-in search_after cursor mode.
+
+    Requests with a `cursor` parameter (empty for the first page) are
+    paged with Elasticsearch's search_after using the sort values of the
+    last result of the previous page. The cost of a page does not grow
+    with its depth and is not limited by max_result_window.
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = _(
+        "Opaque cursor for search_after paging. Pass an empty value to "
+        "start and follow the 'next' link for later pages."
+    )
+    invalid_cursor_message = _("Invalid cursor")
+    # Unique sort field appended to keep search_after paging stable
+    cursor_tiebreaker = "name.keyword"
+
+    def __init__(self, *args, **kwargs):
+        """Initialize a new instance."""
+        super().__init__(*args, **kwargs)
+        self.cursor_mode = False
+        self.next_cursor = None
+
+    def encode_cursor(self, values):
+        """Encode sort values as an opaque cursor."""
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode("utf-8")
+        ).decode("ascii")
+
+    def decode_cursor(self, cursor):
+        """Decode a cursor into sort values.
+
+        :raises NotFound: if the cursor is not valid
+        """
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or not values:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def check_cursor(self, values, fields):
+        """Ensure that decoded sort values match the sort of a search.
+
+        Keyword fields sort by strings. Scores and dates sort by numbers.
+
+        :raises NotFound: if the values do not match the fields
+        """
+        if len(values) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        for value, field in zip(values, fields):
+            if field.endswith(".keyword"):
+                expected = str
+            else:
+                expected = (int, float)
+            if isinstance(value, bool) or not isinstance(value, expected):
+                raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate by page number or by cursor."""
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        after = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+
+        sort = queryset.to_dict().get("sort", [])
+        # Fields are either names or {name: options} dicts
+        names = [
+            field if isinstance(field, str) else next(iter(field))
+            for field in sort
+        ]
+        if self.cursor_tiebreaker not in names:
+            queryset = queryset.sort(*sort, self.cursor_tiebreaker)
+            names.append(self.cursor_tiebreaker)
+        if after is not None:
+            self.check_cursor(after, names)
+            queryset = queryset.extra(search_after=after)
+
+        response = queryset[:page_size].execute()
+        self.count = int(self.get_es_count(response))
+        self.facets = getattr(response, "aggregations", None)
+        hits = list(response)
+        if len(hits) == page_size:
+            self.next_cursor = self.encode_cursor(list(hits[-1].meta.sort))
+        return hits
+
+    def get_next_link(self):
+        """Get the link to the next page."""
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
+
+    def get_previous_link(self):
+        """Get the link to the previous page."""
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        # Cursors only move forward
+        return None
+
+    def get_paginated_response_context(self, data):
+        """Get paginated response data."""
+        if not self.cursor_mode:
+            return super().get_paginated_response_context(data)
+        context = [
+            ("count", self.count),
+            ("next", self.get_next_link()),
+            ("previous", None),
+        ]
+        if hasattr(self.facets, "_d_"):
+            context.append(("facets", self.facets._d_))
+        context.append(("results", data))
+        return context
+
+    def get_schema_operation_parameters(self, view):
+        """Add the cursor parameter to schema."""
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append(
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": str(self.cursor_query_description),
+                "schema": {"type": "string"},
+            }
+        )
+        return parameters
 
     def get_paginated_response_schema(self, schema):
         """Add facets to schema."""
@@ -60,6 +233,37 @@ class Pagination(pagination.QueryFriendlyPageNumberPagination):
         }
 
 
+# Full text search profiles, selected with settings.SEARCH_PROFILE. Quoted
+# phrases are matched against the ".exact" subfields when the profile sets
+# "quote_field_suffix".
+SEARCH_PROFILES = {
+    # Fields people look for tools by, weighted by how specific they are
+    "weighted": {
+        "fields": {
+            "name": {"boost": 5},
+            "title": {"boost": 4},
+            "keywords": {"boost": 3},
+            "subtitle": {"boost": 2},
+            "author": {"boost": 2},
+            "description": None,
+        },
+        "options": {
+            "lenient": True,
+            "quote_field_suffix": ".exact",
+        },
+    },
+    # Every indexed field and subfield, unweighted
+    "all_fields": {
+        "fields": (),
+        "options": {
+            "lenient": True,
+            "quote_field_suffix": ".exact",
+            "all_fields": True,
+        },
+    },
+}
+
+
 def build_term_facet_options(term, missing="--", multi=False):
     """Build options for a term facet.
 
@@ -98,16 +302,11 @@ class ToolDocumentViewSet(BaseDocumentViewSet):
     filter_backends = [
         QueryStringFilterBackend,
         filter_backends.DefaultOrderingFilterBackend,
-        filter_backends.FacetedSearchFilterBackend,
+        CachedFacetsFilterBackend,
         filter_backends.FilteringFilterBackend,
         filter_backends.OrderingFilterBackend,
     ]
-    simple_query_string_search_fields = ()
-    simple_query_string_options = {
-        "lenient": True,
-        "quote_field_suffix": ".exact",
-        "all_fields": True,
-    }
+
     filter_fields = {
         "name": {
             "field": "name",
@@ -208,3 +407,162 @@ class ToolDocumentViewSet(BaseDocumentViewSet):
             "enabled": True,
         },
     }
+
+    # Parameters which do not change the facets of a search
+    FACET_IGNORED_PARAMS = ("page", "page_size", "ordering", "cursor")
+
+    cached_facets = None
+    # Set when Elasticsearch failed and the database answered instead
+    used_fallback = False
+
+    @property
+    def simple_query_string_search_fields(self):
+        """Fields (with boosts) searched by the active search profile."""
+        return SEARCH_PROFILES[settings.SEARCH_PROFILE]["fields"]
+
+    @property
+    def simple_query_string_options(self):
+        """Query options of the active search profile."""
+        return SEARCH_PROFILES[settings.SEARCH_PROFILE]["options"]
+
+    def run_search(self, request, *args, **kwargs):
+        """Search with the configured backend.
+
+        With `SEARCH_BACKEND = "database"` searches are answered by
+        ``DatabaseSearch``. Otherwise Elasticsearch is used, falling
+        back to the database when `SEARCH_DB_FALLBACK` is set and
+        Elasticsearch is unreachable or failing.
+        """
+        if settings.SEARCH_BACKEND == "database":
+            return Response(DatabaseSearch(self, request).search())
+        try:
+            return super().list(request, *args, **kwargs)
+        except TransportError as e:
+            status = e.status_code
+            if not settings.SEARCH_DB_FALLBACK or (
+                isinstance(status, int) and status < 500
+            ):
+                raise
+            logger.warning(
+                "Searching database after Elasticsearch error", exc_info=True
+            )
+            self.used_fallback = True
+            return Response(DatabaseSearch(self, request).search())
+
+    def list(self, request, *args, **kwargs):  # noqa: A003
+        """Search for tools.
+
+        Responses are cached for `SEARCH_CACHE_TTL` seconds keyed on the
+        normalized query parameters. Facets are also cached separately
+        so that other pages and orderings of a search can skip the
+        aggregations. Writes to the search index change the generation
+        used in the cache keys. Responses from the database fallback are
+        not cached so that searches recover as soon as Elasticsearch does.
+        """
+        if settings.SEARCH_CACHE_TTL <= 0:
+            return self.run_search(request, *args, **kwargs)
+
+        params = search_cache.normalize_params(request.query_params)
+        key = search_cache.make_key(
+            "results",
+            request.build_absolute_uri(request.path),
+            settings.SEARCH_PROFILE,
+            params,
+        )
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        facets_key = search_cache.make_key(
+            "facets",
+            settings.SEARCH_PROFILE,
+            [p for p in params if p[0] not in self.FACET_IGNORED_PARAMS],
+        )
+        self.cached_facets = cache.get(facets_key)
+        response = self.run_search(request, *args, **kwargs)
+        if self.used_fallback:
+            return response
+        if self.cached_facets is not None:
+            data = OrderedDict(
+                (name, value)
+                for name, value in response.data.items()
+                if name != "results"
+            )
+            data["facets"] = self.cached_facets
+            data["results"] = response.data["results"]
+            response.data = data
+        elif "facets" in response.data:
+            cache.set(
+                facets_key, response.data["facets"], settings.SEARCH_CACHE_TTL
+            )
+        cache.set(key, response.data, settings.SEARCH_CACHE_TTL)
+        return response
+
+
+@extend_schema_view(
+    list=extend_schema(
+        description=_("""Suggest tools by name or title prefix."""),
+        responses=AutocompleteSerializer(many=True),
+        parameters=[
+            OpenApiParameter(
+                "q",
+                OpenApiTypes.STR,
+                OpenApiParameter.QUERY,
+                description=_("Prefix to complete"),
+            ),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                OpenApiParameter.QUERY,
+                description=_("Maximum number of suggestions (1-25)"),
+            ),
+        ],
+    ),
+)
+class AutocompleteViewSet(viewsets.ViewSet):
+    """Search-as-you-type suggestions."""
+
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 25
+
+    def _get_limit(self, request):
+        """Get the number of suggestions to return."""
+        try:
+            limit = int(request.query_params.get("limit", self.DEFAULT_LIMIT))
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
+        return max(1, min(limit, self.MAX_LIMIT))
+
+    def list(self, request):  # noqa: A003
+        """Get tools whose name or title starts with a prefix."""
+        prefix = request.query_params.get("q", "").strip()
+        if not prefix:
+            return Response([])
+        limit = self._get_limit(request)
+
+        key = search_cache.make_key("autocomplete", prefix.lower(), limit)
+        data = cache.get(key)
+        if data is None:
+            search = (
+                ToolDocument.search()
+                .source(["name", "title"])
+                .extra(size=0)
+                .suggest(
+                    "tools",
+                    prefix,
+                    completion={
+                        "field": "suggest",
+                        "size": limit,
+                        "skip_duplicates": True,
+                    },
+                )
+            )
+            options = search.execute().to_dict()["suggest"]["tools"][0]
+            serializer = AutocompleteSerializer(
+                [option["_source"] for option in options["options"]],
+                many=True,
+            )
+            data = serializer.data
+            if settings.SEARCH_CACHE_TTL > 0:
+                cache.set(key, data, settings.SEARCH_CACHE_TTL)
+        return Response(data)
@@ -20,14 +20,20 @@ import logging
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
 from django.core import validators
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db import router
+from django.db import transaction
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
 import reversion
+from reversion.models import Revision
+from reversion.models import Version
 from reversion.signals import post_revision_commit
 
 from safedelete.managers import SafeDeleteManager
@@ -42,6 +48,8 @@ from toolhub.fields import BlankAsNullTextField
 from toolhub.fields import JSONSchemaField
 
 from . import schema
+from .signals import post_bulk_delete
+from .signals import post_bulk_save
 from .utils import language_data
 from .validators import validate_language_code
 from .validators import validate_language_code_list
@@ -98,19 +106,26 @@ class ToolManager(SafeDeleteManager):
 
     DEFAULT_LANGUAGE = "en"
 
+    # Number of rows per statement when calling `bulk_from_toolinfo`.
+    BULK_BATCH_SIZE = 100
+
     def _valid_field_names(self):
         """List of all valid Tool model field names."""
         if self.ALL_FIELDS is None:
             self.ALL_FIELDS = [field.name for field in Tool._meta.fields]
         return self.ALL_FIELDS
 
+    def normalize_name(self, name):
+        """Normalize a toolinfo name into the name of a Tool."""
+        if name.startswith("toolforge."):
+            # Fixup tool names made by Striker to work as slugs
+            name = "toolforge-" + name[10:]
+        return name_to_slug(name)
+
     def normalize_toolinfo(self, record):
         """Normalize incoming record formatting."""
         if "name" in record:
-            if record["name"].startswith("toolforge."):
-                # Fixup tool names made by Striker to work as slugs
-                record["name"] = "toolforge-" + record["name"][10:]
-            record["name"] = name_to_slug(record["name"])
+            record["name"] = self.normalize_name(record["name"])
 
         if "$schema" in record:
             record["_schema"] = record.pop("$schema")
@@ -280,44 +295,315 @@ class ToolManager(SafeDeleteManager):
             if created:
                 return tool, created, False
 
-            # Compare input to prior model and decide if anything of note has
-            # changed. Revived models are always considered changed.
-            has_changes = revived
-
-            for key, value in record.items():
-                if key in self.VARIANT_FIELDS:
-                    continue
-
-                prior = getattr(tool, key)
-
-                if value != prior:
-                    if not revived and key in self.INVARIANT_FIELDS:
-                        # Invariant fields are allowed to change when reviving
-                        # a deleted record.
-                        raise ValidationError(
-                            _(
-                                "Changing %(key)s after initial "
-                                "object creation is not allowed"
-                            ),
-                            code="invariant",
-                            params={"key": key},
-                        )
-
-                    setattr(tool, key, value)
-                    has_changes = True
-                    logger.debug(
-                        "%s: Updating %s to %s (was %s)",
-                        record["name"],
-                        key,
-                        value,
-                        prior,
-                    )
+            has_changes = bool(self._update_from_record(tool, record, revived))
             if has_changes:
                 with auditlog_context(creator, comment):
                     tool.save()
 
         return tool, False, has_changes
 
+    def _update_from_record(self, tool, record, revived=False, diff=None):
+        """Apply a normalized toolinfo record to an existing Tool.
+
+        Compare input to prior model and decide if anything of note has
+        changed. Revived models are always considered changed.
+
+        :param diff: Optional dict to collect (prior, new) value tuples for
+            each changed field in
+        :returns: list of changed field names or None if nothing changed
+        :raises ValidationError: if an invariant field would change
+        """
+        changed = []
+        for key, value in record.items():
+            if key in self.VARIANT_FIELDS:
+                continue
+
+            prior = getattr(tool, key)
+
+            if value != prior:
+                if not revived and key in self.INVARIANT_FIELDS:
+                    # Invariant fields are allowed to change when reviving
+                    # a deleted record.
+                    raise ValidationError(
+                        _(
+                            "Changing %(key)s after initial "
+                            "object creation is not allowed"
+                        ),
+                        code="invariant",
+                        params={"key": key},
+                    )
+
+                setattr(tool, key, value)
+                changed.append(key)
+                if diff is not None:
+                    diff[key] = (prior, value)
+                logger.debug(
+                    "%s: Updating %s to %s (was %s)",
+                    record["name"],
+                    key,
+                    value,
+                    prior,
+                )
+        if revived:
+            changed.append("deleted")
+        return changed or None
+
+    def bulk_from_toolinfo(self, records, creator, origin, comment=None):
+        """Create or update many Tools using data from toolinfo records.
+
+        Bulk equivalent of `from_toolinfo`. Existing rows are fetched with
+        a single query and changes are written using `bulk_create` and
+        `bulk_update`. All created and changed Tools share a single
+        revision. Version and LogEntry rows are also inserted in bulk.
+        Model signals are not sent for the Tools; `post_bulk_save` is sent
+        instead.
+
+        Records that would change an invariant field, or that repeat the
+        name of an earlier record, are rejected and logged.
+
+        :param records: Toolinfo records. May be mutated as a side effect.
+        :type records: list(dict)
+        :param creator: User creating/updating the records
+        :type creator: settings.AUTH_USER_MODEL
+        :param origin: Origin of this submission
+        :type origin: str
+        :param comment: User provided comment for this change
+        :type comment: str
+        :returns: list of (tool, was_created, has_changes) tuples, or None
+            for rejected records, in the same order as the input
+        :rtype: list
+        """
+        now = timezone.now()
+        results, update_fields = self._plan_toolinfo(
+            records, creator, origin, now
+        )
+        created = [r[0] for r in results if r and r[1]]
+        updated = [r[0] for r in results if r and r[2]]
+
+        with transaction.atomic():
+            if created:
+                self.bulk_create(created, batch_size=self.BULK_BATCH_SIZE)
+                # Fetch primary keys which bulk_create does not set for us
+                saved = {
+                    tool.name: tool
+                    for tool in self.filter(
+                        name__in=[tool.name for tool in created]
+                    )
+                }
+                created = [saved[tool.name] for tool in created]
+                for result in results:
+                    if result and result[1]:
+                        result[0] = saved[result[0].name]
+            if updated:
+                update_fields.add("modified_date")
+                self.all_with_deleted().bulk_update(
+                    updated,
+                    sorted(update_fields),
+                    batch_size=self.BULK_BATCH_SIZE,
+                )
+            self._bulk_log_changes(created, updated, creator, comment, now)
+
+        if created or updated:
+            post_bulk_save.send(sender=self.model, instances=created + updated)
+        return [tuple(result) if result else None for result in results]
+
+    def diff_toolinfo(self, records, creator, origin):
+        """Describe the changes that `bulk_from_toolinfo` would make.
+
+        Nothing is written to the database.
+
+        :param records: Toolinfo records. May be mutated as a side effect.
+        :type records: list(dict)
+        :param creator: User creating/updating the records
+        :type creator: settings.AUTH_USER_MODEL
+        :param origin: Origin of this submission
+        :type origin: str
+        :returns: list of (name, action, changes) tuples in the same order
+            as the input. Action is one of "create", "revive", "update",
+            "unchanged" or "reject". Changes is a dict of field name to
+            (prior, new) value tuples.
+        :rtype: list
+        """
+        diffs = []
+        results, _ = self._plan_toolinfo(
+            records, creator, origin, timezone.now(), diffs
+        )
+        report = []
+        for record, result, changes in zip(records, results, diffs):
+            if result is None:
+                action = "reject"
+            elif result[1]:
+                action = "create"
+            elif "deleted" in changes:
+                action = "revive"
+            elif result[2]:
+                action = "update"
+            else:
+                action = "unchanged"
+            report.append((record["name"], action, changes))
+        return report
+
+    def _plan_toolinfo(  # noqa: R0913
+        self, records, creator, origin, now, diffs=None
+    ):
+        """Work out the changes that toolinfo records would make.
+
+        Existing Tools are fetched with a single query and updated in
+        memory, but nothing is saved.
+
+        :param diffs: Optional list to collect a dict of changed fields for
+            each record in
+        :returns: (results, update_fields) where results is a list of
+            [tool, was_created, has_changes] lists, or None for rejected
+            records, and update_fields is the set of changed field names
+        """
+        for record in records:
+            record.pop("comment", None)
+            record["created_by"] = creator
+            record["modified_by"] = creator
+            record["origin"] = origin
+            self.normalize_toolinfo(record)
+
+        existing = {
+            tool.name: tool
+            for tool in self.all_with_deleted().filter(
+                name__in=[record["name"] for record in records]
+            )
+        }
+        results = []
+        update_fields = set()
+        names = set()
+        for record in records:
+            diff = {}
+            if diffs is not None:
+                diffs.append(diff)
+            name = record["name"]
+            if name in names:
+                logger.error("Duplicate toolinfo record %s", name)
+                results.append(None)
+                continue
+            names.add(name)
+
+            tool = existing.get(name)
+            if tool is None:
+                results.append([self.model(**record), True, False])
+                continue
+
+            revived = tool.deleted is not None
+            if revived:
+                diff["deleted"] = (tool.deleted, None)
+                tool.deleted = None
+            try:
+                changed = self._update_from_record(tool, record, revived, diff)
+            except ValidationError:
+                logger.exception("Rejected toolinfo record %s", name)
+                results.append(None)
+                continue
+            if changed:
+                tool.modified_date = now
+                update_fields.update(changed)
+            results.append([tool, False, bool(changed)])
+        return results, update_fields
+
+    def bulk_soft_delete(self, names, user, comment=None):
+        """Soft delete many Tools by name.
+
+        Bulk equivalent of calling `delete()` on each Tool. All matching
+        rows are marked as deleted with a single UPDATE and LogEntry rows
+        are inserted in bulk. Model signals are not sent for the Tools;
+        `post_bulk_delete` is sent instead.
+
+        :param names: Names of the tools to delete
+        :type names: list(str)
+        :param user: User deleting the tools
+        :type user: settings.AUTH_USER_MODEL
+        :param comment: Comment to record in the auditlog
+        :type comment: str
+        :returns: list of deleted tools
+        :rtype: list
+        """
+        tools = list(self.filter(name__in=names))
+        if not tools:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            self.filter(pk__in=[tool.pk for tool in tools]).update(
+                deleted=now, modified_date=now
+            )
+            ct_id = get_tool_content_type_id()
+            LogEntry.objects.bulk_create(
+                [
+                    LogEntry(
+                        user=user,
+                        content_type_id=ct_id,
+                        object_id=tool.pk,
+                        action=LogEntry.DELETE,
+                        change_message=comment,
+                    )
+                    for tool in tools
+                ],
+                batch_size=self.BULK_BATCH_SIZE,
+            )
+        for tool in tools:
+            tool.deleted = now
+            tool.modified_date = now
+        post_bulk_delete.send(sender=self.model, instances=tools)
+        return tools
+
+    def _bulk_log_changes(  # noqa: R0913
+        self, created, updated, creator, comment, date_created
+    ):
+        """Record a revision and auditlog entries for bulk changes."""
+        tools = created + updated
+        if not tools:
+            return
+        revision = Revision.objects.create(
+            date_created=date_created,
+            user=creator,
+            comment=comment or "",
+        )
+        RevisionMetadata.objects.create(revision=revision)
+        ct_id = get_tool_content_type_id()
+        db = router.db_for_write(self.model)
+        Version.objects.bulk_create(
+            [
+                Version(
+                    revision=revision,
+                    content_type_id=ct_id,
+                    object_id=str(tool.pk),
+                    db=db,
+                    format="json",
+                    serialized_data=serializers.serialize("json", (tool,)),
+                    object_repr=str(tool),
+                )
+                for tool in tools
+            ],
+            batch_size=self.BULK_BATCH_SIZE,
+        )
+        version_ids = dict(
+            Version.objects.filter(revision=revision).values_list(
+                "object_id", "id"
+            )
+        )
+        LogEntry.objects.bulk_create(
+            [
+                LogEntry(
+                    user=creator,
+                    content_type_id=ct_id,
+                    object_id=tool.pk,
+                    action=action,
+                    change_message=comment,
+                    params={"revision": version_ids[str(tool.pk)]},
+                )
+                for action, group in (
+                    (LogEntry.CREATE, created),
+                    (LogEntry.UPDATE, updated),
+                )
+                for tool in group
+            ],
+            batch_size=self.BULK_BATCH_SIZE,
+        )
+
 
 @reversion.register()
 @registry.register()
@@ -18,15 +18,19 @@
 import collections
 import functools
 import json
+import re
 import urllib.parse
 
 from django.contrib.staticfiles import finders
 
 from drf_spectacular.extensions import OpenApiSerializerFieldExtension
 
+import jsonschema.validators
+
 
 SCHEMA_FILE_PATTERN = "jsonschema/toolinfo/{}.json"
 CURRENT_SCHEMA = "1.2.0"
+SCHEMA_VERSIONS = ("1.0.0", "1.1.1", CURRENT_SCHEMA)
 
 
 KEYWORDS = {
@@ -45,6 +49,28 @@ def load_schema(version):
         return json.load(schema)
 
 
+def version_for(uri):
+    """Get the schema version named by a toolinfo $schema URI.
+
+    URIs that do not name a known version get the current version.
+    """
+    match = re.search(r"(\d+\.\d+\.\d+)", uri or "")
+    if match and match.group(1) in SCHEMA_VERSIONS:
+        return match.group(1)
+    return CURRENT_SCHEMA
+
+
+@functools.lru_cache(maxsize=10)
+def record_validator(version):
+    """Get a compiled validator for a single toolinfo record."""
+    source = load_schema(version)
+    schema = {k: v for k, v in source.items() if k != "oneOf"}
+    schema["$ref"] = "#/definitions/tool"
+    clazz = jsonschema.validators.validator_for(schema)
+    clazz.check_schema(schema)
+    return clazz(schema)
+
+
 def resolve_ref(document, ref):
     """Resolve a reference within the given document."""
     _, fragment = urllib.parse.urldefrag(ref)
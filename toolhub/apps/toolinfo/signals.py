@@ -0,0 +1,29 @@
+# Copyright (c) 2021 Wikimedia Foundation and contributors.
+# All Rights Reserved.
+#
+# This file is part of Toolhub.
+#
+# Toolhub is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Toolhub is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
+from django.dispatch import Signal
+
+
+# Sent after Tool rows have been written with bulk_create/bulk_update. Those
+# methods do not emit per-instance model signals, so receivers that need to
+# react to every saved Tool (e.g. search indexing) must also listen here.
+post_bulk_save = Signal(providing_args=["instances"])
+
+# Sent after Tool rows have been soft deleted in bulk with
+# `ToolManager.bulk_soft_delete`. No per-instance `post_softdelete` signal is
+# sent for those rows.
+post_bulk_delete = Signal(providing_args=["instances"])
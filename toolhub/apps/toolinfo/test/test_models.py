@@ -17,10 +17,14 @@
 # along with Toolhub.  If not, see <http://www.gnu.org/licenses/>.
 import json
 import os
+from unittest import mock
 
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 
+from reversion.models import Version
+
+from toolhub.apps.auditlog.models import LogEntry
 from toolhub.apps.user.models import ToolhubUser
 
 from .. import models
@@ -224,6 +228,117 @@ class ToolManagerTest(TestCase):
                 msg="Expected changing origin to raise ValidationError"
             )
 
+    def test_bulk_from_toolinfo(self):
+        """Create, update, revive and reject tools in one call."""
+        unchanged = {
+            "name": "bulk-unchanged",
+            "title": "Unchanged",
+            "description": "Unchanged",
+            "url": "https://example.org/unchanged",
+        }
+        changed = dict(unchanged, name="bulk-changed")
+        deleted = dict(unchanged, name="bulk-deleted")
+        api = dict(unchanged, name="bulk-api")
+        for record, origin in (
+            (unchanged, models.Tool.ORIGIN_CRAWLER),
+            (changed, models.Tool.ORIGIN_CRAWLER),
+            (deleted, models.Tool.ORIGIN_CRAWLER),
+            (api, models.Tool.ORIGIN_API),
+        ):
+            models.Tool.objects.from_toolinfo(record.copy(), self.user, origin)
+        models.Tool.objects.get(name="bulk-deleted").delete()
+        log_count = LogEntry.objects.count()
+
+        results = models.Tool.objects.bulk_from_toolinfo(
+            [
+                self.toolinfo.copy(),
+                unchanged.copy(),
+                dict(changed, title="Changed"),
+                deleted.copy(),
+                api.copy(),
+                unchanged.copy(),
+            ],
+            self.user,
+            models.Tool.ORIGIN_CRAWLER,
+            "bulk test",
+        )
+
+        obj, created, updated = results[0]
+        self.assertTrue(created)
+        self.assertFalse(updated)
+        self.assertIsNotNone(obj.pk)
+        self.assertToolBasics(obj, self.toolinfo)
+        self.assertEqual(results[1][1:], (False, False))
+        self.assertEqual(results[2][1:], (False, True))
+        self.assertEqual(results[3][1:], (False, True))
+        # Origin change and duplicate name are rejected
+        self.assertIsNone(results[4])
+        self.assertIsNone(results[5])
+
+        self.assertEqual(
+            models.Tool.objects.get(name="bulk-changed").title, "Changed"
+        )
+        self.assertEqual(
+            models.Tool.objects.get(name="bulk-deleted").name, "bulk-deleted"
+        )
+
+        # One revision for all three changes, with auditlog entries that
+        # point at each version.
+        versions = Version.objects.filter(revision__comment="bulk test")
+        self.assertEqual(versions.count(), 3)
+        self.assertEqual(len({v.revision_id for v in versions}), 1)
+        logs = LogEntry.objects.order_by("id")[log_count:]
+        self.assertEqual(
+            sorted(log.action for log in logs),
+            [LogEntry.CREATE, LogEntry.UPDATE, LogEntry.UPDATE],
+        )
+        for log in logs:
+            self.assertEqual(log.user, self.user)
+            self.assertEqual(log.change_message, "bulk test")
+            self.assertEqual(
+                Version.objects.get(pk=log.params["revision"]).object_id,
+                str(log.object_id),
+            )
+
+    def test_bulk_soft_delete(self):
+        """Soft delete many tools in one call."""
+        record = {
+            "title": "Delete me",
+            "description": "Delete me",
+            "url": "https://example.org/delete",
+        }
+        names = ["bulk-delete-{}".format(i) for i in range(5)]
+        for name in names:
+            models.Tool.objects.from_toolinfo(
+                dict(record, name=name), self.user, models.Tool.ORIGIN_CRAWLER
+            )
+        log_count = LogEntry.objects.count()
+
+        with mock.patch.object(models.post_bulk_delete, "send") as send:
+            with self.assertNumQueries(5):
+                tools = models.Tool.objects.bulk_soft_delete(
+                    names + ["bulk-delete-missing"], self.user, "bulk test"
+                )
+        send.assert_called_once_with(sender=models.Tool, instances=tools)
+        self.assertEqual(sorted(tool.name for tool in tools), names)
+        self.assertFalse(models.Tool.objects.filter(name__in=names).exists())
+        self.assertEqual(
+            models.Tool.objects.deleted_only().filter(name__in=names).count(),
+            5,
+        )
+
+        logs = LogEntry.objects.order_by("id")[log_count:]
+        self.assertEqual(len(logs), 5)
+        for log in logs:
+            self.assertEqual(log.action, LogEntry.DELETE)
+            self.assertEqual(log.user, self.user)
+            self.assertEqual(log.change_message, "bulk test")
+
+        # Already deleted tools are ignored
+        self.assertEqual(
+            models.Tool.objects.bulk_soft_delete(names, self.user), []
+        )
+
     def test_comment_field_allowed(self):
         """Normalization should not strip a "comment" field"""
         fixture = self.toolinfo.copy()
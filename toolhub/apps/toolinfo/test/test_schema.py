@@ -62,3 +62,34 @@ class SchemaTest(SimpleTestCase):
             ),
             expect,
         )
+
+    def test_version_for(self):
+        """Find the schema version for a $schema URI."""
+        self.assertEqual(
+            schema.version_for("/toolinfo/1.2.0-draft02"), "1.2.0"
+        )
+        self.assertEqual(
+            schema.version_for("https://example.org/toolinfo/1.1.1"), "1.1.1"
+        )
+        self.assertEqual(schema.version_for("/toolinfo/9.9.9"), "1.2.0")
+        self.assertEqual(schema.version_for(None), schema.CURRENT_SCHEMA)
+
+    def test_record_validator(self):
+        """Validate a single record against each schema version."""
+        record = {
+            "name": "test",
+            "title": "Test",
+            "description": "Test",
+            "url": "https://example.org/",
+        }
+        for version in schema.SCHEMA_VERSIONS:
+            validator = schema.record_validator(version)
+            self.assertIs(validator, schema.record_validator(version))
+            self.assertTrue(validator.is_valid(record))
+            self.assertFalse(validator.is_valid({"name": "test"}))
+            self.assertFalse(validator.is_valid([record]))
+
+        validator = schema.record_validator(schema.CURRENT_SCHEMA)
+        self.assertFalse(
+            validator.is_valid(dict(record, tool_type="not a tool type"))
+        )
@@ -54,6 +54,11 @@ root.register(
     oauth_views.AuthorizationViewSet,
     basename="accesstoken",
 )
+root.register(
+    "search/autocomplete",
+    search_views.AutocompleteViewSet,
+    basename="search-autocomplete",
+)
 root.register(
     "search/tools", search_views.ToolDocumentViewSet, basename="search-tools"
 )
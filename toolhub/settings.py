@@ -165,7 +165,7 @@ INSTALLED_APPS = [
     "toolhub.apps.auditlog",
     "toolhub.apps.crawler",
     "toolhub.apps.lists",
-    "toolhub.apps.search",
+    "toolhub.apps.search.apps.SearchConfig",
     "toolhub.apps.toolinfo",
     "toolhub.apps.user",
     "toolhub.apps.versioned",
@@ -261,10 +261,47 @@ ELASTICSEARCH_DSL_INDEX_SETTINGS = {
     "number_of_shards": env.int("ES_INDEX_SHARDS", default=1),
 }
 ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = (
-    "toolhub.apps.search.signals.SignalProcessor"
+    "toolhub.apps.search.signals.DeferredSignalProcessor"
 )
 ELASTICSEARCH_DSL_AUTOSYNC = env.bool("ES_DSL_AUTOSYNC", default=True)
 ELASTICSEARCH_DSL_PARALLEL = env.bool("ES_DSL_PARALLEL", default=True)
+# Number of pending index updates that triggers a flush while deferred
+SEARCH_INDEX_BATCH_SIZE = env.int("SEARCH_INDEX_BATCH_SIZE", default=500)
+# Retries (with exponential backoff) before queueing failed index updates
+SEARCH_INDEX_MAX_RETRIES = env.int("SEARCH_INDEX_MAX_RETRIES", default=3)
+SEARCH_INDEX_RETRY_DELAY = env.float("SEARCH_INDEX_RETRY_DELAY", default=0.5)
+# Full text search profile (see toolhub.apps.search.views.SEARCH_PROFILES)
+SEARCH_PROFILE = env.str("SEARCH_PROFILE", default="weighted")
+# Seconds to cache search results and facets (0 disables caching)
+SEARCH_CACHE_TTL = env.int("SEARCH_CACHE_TTL", default=60)
+# Search backend for /api/search/tools/: "elasticsearch" or "database"
+SEARCH_BACKEND = env.str("SEARCH_BACKEND", default="elasticsearch")
+# Answer searches from the database while Elasticsearch is unavailable
+SEARCH_DB_FALLBACK = env.bool("SEARCH_DB_FALLBACK", default=True)
+# Maintain the database search tables when Tools change
+SEARCH_DB_INDEX = env.bool("SEARCH_DB_INDEX", default=True)
+
+# === Crawler ===
+# Maximum number of toolinfo URLs to fetch in parallel
+CRAWLER_MAX_WORKERS = env.int("CRAWLER_MAX_WORKERS", default=16)
+# Maximum number of parallel requests to a single host
+CRAWLER_PER_HOST_MAX_WORKERS = env.int(
+    "CRAWLER_PER_HOST_MAX_WORKERS", default=2
+)
+# Minimum number of seconds between starting requests to a single host
+CRAWLER_PER_HOST_DELAY = env.float("CRAWLER_PER_HOST_DELAY", default=0.25)
+# Longest Retry-After (in seconds) that we will wait for before retrying
+CRAWLER_MAX_RETRY_AFTER = env.int("CRAWLER_MAX_RETRY_AFTER", default=60)
+# Timeouts (in seconds) for connecting to and reading from remote servers
+CRAWLER_CONNECT_TIMEOUT = env.float("CRAWLER_CONNECT_TIMEOUT", default=5)
+CRAWLER_READ_TIMEOUT = env.float("CRAWLER_READ_TIMEOUT", default=30)
+# Largest toolinfo response body (in bytes) that the crawler will read
+CRAWLER_MAX_RESPONSE_SIZE = env.int(
+    "CRAWLER_MAX_RESPONSE_SIZE", default=10 * 1024 * 1024
+)
+# Bounds (in seconds) for the adaptive re-crawl interval of each URL
+CRAWLER_MIN_INTERVAL = env.int("CRAWLER_MIN_INTERVAL", default=3600)
+CRAWLER_MAX_INTERVAL = env.int("CRAWLER_MAX_INTERVAL", default=604800)
 
 # === Authentication ===
 AUTH_USER_MODEL = "user.ToolhubUser"